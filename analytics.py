@@ -0,0 +1,268 @@
+"""
+Transcript Analytics
+Streams transcript segments (see transcript.py) and reports emergency-type
+frequency over time, a sample of unmatched messages and LLM fallback rates
+
+Usage:
+    python analytics.py                                   # transcripts/, hourly buckets
+    python analytics.py --dir /data/transcripts --bucket day --workers 8
+    python analytics.py --since 2026-10-01 --samples 50 --json report.json
+
+Segments are scanned in parallel by a process pool, one segment per task,
+reading line by line, so memory depends on the number of time buckets and
+samples rather than on the size of the log. "Unmatched" messages are turns
+that no protocol or protocol search answered (the LLM or canned fallbacks did).
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from multiprocessing import Pool
+
+from fastjson import decode
+from transcript import TRANSCRIPT_DIR, list_segments
+
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+UNMATCHED_ROUTES = ('llm', 'fallback')
+
+DEFAULT_SAMPLES = 20
+# Emergency types shown as their own column; the rest are summed into "other"
+DEFAULT_TOP_TYPES = 8
+
+
+def parse_time(value):
+    """ISO date/time or epoch seconds"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def empty_summary():
+    return {
+        'segments': 0,
+        'bytes': 0,
+        'records': 0,
+        'turns': 0,
+        'detections': 0,
+        'bad_lines': 0,
+        'first_ts': None,
+        'last_ts': None,
+        'types': {},
+        'routes': {},
+        'llm_by_bucket': {},
+        'unmatched_total': 0,
+        'unmatched': []
+    }
+
+
+def scan_segment(task):
+    """
+    Aggregate one segment (runs in a pool worker)
+    Unmatched messages are sampled bottom-k: each gets a random key and the k
+    smallest keys are kept, so samples from all segments merge into a uniform sample
+    """
+    path, bucket_seconds, since, until, samples, seed = task
+    rng = random.Random(f"{seed}:{os.path.basename(path)}")
+    summary = empty_summary()
+    summary['segments'] = 1
+    summary['bytes'] = os.path.getsize(path)
+    types = summary['types']
+    routes = summary['routes']
+    llm_by_bucket = summary['llm_by_bucket']
+    # Max-heap of (-key, ts, message) holding the smallest keys
+    heap = []
+
+    with open(path, 'rb') as f:
+        for line in f:
+            try:
+                record = decode(line)
+                ts = record['ts']
+            except (ValueError, KeyError, TypeError):
+                # A crash can leave a partial last line
+                summary['bad_lines'] += 1
+                continue
+            if (since is not None and ts < since) or (until is not None and ts >= until):
+                continue
+            summary['records'] += 1
+            if summary['first_ts'] is None or ts < summary['first_ts']:
+                summary['first_ts'] = ts
+            if summary['last_ts'] is None or ts > summary['last_ts']:
+                summary['last_ts'] = ts
+
+            if record.get('kind') == 'detection':
+                summary['detections'] += 1
+                continue
+            summary['turns'] += 1
+
+            bucket = int(ts // bucket_seconds * bucket_seconds)
+            counts = types.setdefault(bucket, {})
+            emergency_type = record.get('emergency_type') or 'unknown'
+            counts[emergency_type] = counts.get(emergency_type, 0) + 1
+
+            route = record.get('route') or 'unknown'
+            routes[route] = routes.get(route, 0) + 1
+            if route in UNMATCHED_ROUTES:
+                llm = llm_by_bucket.setdefault(bucket, [0, 0])
+                llm[route == 'fallback'] += 1
+                summary['unmatched_total'] += 1
+                key = rng.random()
+                if len(heap) < samples:
+                    heapq.heappush(heap, (-key, ts, record.get('message', '')))
+                elif samples and key < -heap[0][0]:
+                    heapq.heapreplace(heap, (-key, ts, record.get('message', '')))
+
+    summary['unmatched'] = [(-negative_key, ts, message) for negative_key, ts, message in heap]
+    return summary
+
+
+def merge(into, summary, samples):
+    for key in ('segments', 'bytes', 'records', 'turns', 'detections', 'bad_lines', 'unmatched_total'):
+        into[key] += summary[key]
+    for key, pick in (('first_ts', min), ('last_ts', max)):
+        if summary[key] is not None:
+            into[key] = summary[key] if into[key] is None else pick(into[key], summary[key])
+    for bucket, counts in summary['types'].items():
+        merged = into['types'].setdefault(bucket, {})
+        for emergency_type, count in counts.items():
+            merged[emergency_type] = merged.get(emergency_type, 0) + count
+    for route, count in summary['routes'].items():
+        into['routes'][route] = into['routes'].get(route, 0) + count
+    for bucket, (llm, fallback) in summary['llm_by_bucket'].items():
+        merged = into['llm_by_bucket'].setdefault(bucket, [0, 0])
+        merged[0] += llm
+        merged[1] += fallback
+    into['unmatched'] = heapq.nsmallest(samples, into['unmatched'] + summary['unmatched'])
+
+
+def analyse(paths, bucket_seconds, since=None, until=None, samples=DEFAULT_SAMPLES, workers=None, seed=0):
+    """Scan segments in parallel and merge their summaries as they finish"""
+    total = empty_summary()
+    tasks = [(path, bucket_seconds, since, until, samples, seed) for path in paths]
+    if workers == 1 or len(tasks) <= 1:
+        for task in tasks:
+            merge(total, scan_segment(task), samples)
+        return total
+    with Pool(processes=workers) as pool:
+        for summary in pool.imap_unordered(scan_segment, tasks):
+            merge(total, summary, samples)
+    return total
+
+
+def fallback_rate(llm, fallback):
+    return fallback / (llm + fallback) if llm + fallback else None
+
+
+def build_report(total, bucket_name):
+    type_totals = {}
+    for counts in total['types'].values():
+        for emergency_type, count in counts.items():
+            type_totals[emergency_type] = type_totals.get(emergency_type, 0) + count
+    llm = total['routes'].get('llm', 0)
+    fallback = total['routes'].get('fallback', 0)
+    return {
+        'segments': total['segments'],
+        'bytes': total['bytes'],
+        'records': total['records'],
+        'turns': total['turns'],
+        'detections': total['detections'],
+        'bad_lines': total['bad_lines'],
+        'first': datetime.fromtimestamp(total['first_ts']).isoformat() if total['first_ts'] else None,
+        'last': datetime.fromtimestamp(total['last_ts']).isoformat() if total['last_ts'] else None,
+        'bucket': bucket_name,
+        'emergency_types': dict(sorted(type_totals.items(), key=lambda item: -item[1])),
+        'emergency_types_over_time': {datetime.fromtimestamp(bucket).isoformat(): counts
+                                      for bucket, counts in sorted(total['types'].items())},
+        'routes': total['routes'],
+        'llm': {
+            'llm': llm,
+            'fallback': fallback,
+            'fallback_rate': fallback_rate(llm, fallback),
+            'over_time': {datetime.fromtimestamp(bucket).isoformat(): {
+                'llm': counts[0], 'fallback': counts[1], 'fallback_rate': fallback_rate(*counts)}
+                for bucket, counts in sorted(total['llm_by_bucket'].items())}
+        },
+        'unmatched_total': total['unmatched_total'],
+        'unmatched_samples': [{'time': datetime.fromtimestamp(ts).isoformat(), 'message': message}
+                              for _, ts, message in sorted(total['unmatched'], key=lambda item: item[1])]
+    }
+
+
+def print_report(report, top_types, elapsed):
+    megabytes = report['bytes'] / 1024 / 1024
+    print(f"📊 {report['segments']} segments, {megabytes:,.1f} MB, {report['records']:,} records "
+          f"({report['turns']:,} turns, {report['detections']:,} detections) in {elapsed:.2f} s "
+          f"({megabytes / elapsed if elapsed else 0:,.0f} MB/s)")
+    if report['bad_lines']:
+        print(f"⚠️  {report['bad_lines']} unreadable lines skipped")
+    if not report['turns']:
+        return
+    print(f"   {report['first']} -> {report['last']}")
+
+    columns = list(report['emergency_types'])[:top_types]
+    print(f"\n🚑 Emergency types per {report['bucket']}")
+    header = f"{'bucket':19s} {'turns':>8s} " + ' '.join(f"{name[:11]:>11s}" for name in columns)
+    print(header + f" {'other':>8s} {'fallback':>9s}")
+    llm_over_time = report['llm']['over_time']
+    for bucket, counts in report['emergency_types_over_time'].items():
+        shown = [counts.get(name, 0) for name in columns]
+        total = sum(counts.values())
+        rate = llm_over_time.get(bucket, {}).get('fallback_rate')
+        rate_text = f"{rate:9.1%}" if rate is not None else f"{'-':>9s}"
+        print(f"{bucket[:19]:19s} {total:8d} " + ' '.join(f"{count:11d}" for count in shown) +
+              f" {total - sum(shown):8d} {rate_text}")
+
+    print("\n🧭 Reply routes")
+    for route, count in sorted(report['routes'].items(), key=lambda item: -item[1]):
+        print(f"  {route:12s} {count:10,d} {count / report['turns']:7.1%}")
+    llm = report['llm']
+    if llm['fallback_rate'] is not None:
+        print(f"\n🤖 LLM fallback rate: {llm['fallback_rate']:.1%} "
+              f"({llm['fallback']:,} fallbacks, {llm['llm']:,} LLM replies)")
+
+    print(f"\n❓ Unmatched messages: {report['unmatched_total']:,} "
+          f"({report['unmatched_total'] / report['turns']:.1%} of turns), sample:")
+    for sample in report['unmatched_samples']:
+        print(f"  {sample['time'][:19]}  {sample['message'][:100]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus transcript analytics')
+    parser.add_argument('--dir', default=TRANSCRIPT_DIR, help='Transcript segment directory')
+    parser.add_argument('--bucket', choices=sorted(BUCKETS), default='hour', help='Time bucket size')
+    parser.add_argument('--since', help='Only records at or after this time (ISO or epoch)')
+    parser.add_argument('--until', help='Only records before this time (ISO or epoch)')
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='Unmatched messages to sample')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP_TYPES, help='Emergency types shown as columns')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the unmatched sample')
+    parser.add_argument('--json', help='Also write the full report to this file')
+    args = parser.parse_args()
+
+    paths = list_segments(args.dir)
+    if not paths:
+        print(f"No transcript segments in {args.dir}")
+        return 1
+
+    start = time.perf_counter()
+    total = analyse(paths, BUCKETS[args.bucket], parse_time(args.since), parse_time(args.until),
+                    max(args.samples, 0), max(args.workers or 1, 1), args.seed)
+    report = build_report(total, args.bucket)
+    print_report(report, args.top, time.perf_counter() - start)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
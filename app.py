@@ -1,193 +1,317 @@
-from flask import Flask, render_template, jsonify, request, send_from_directory  # FIXED LINE
+from flask import Flask, Blueprint, current_app, render_template, jsonify, request, send_from_directory, g, Response  # FIXED LINE
 import os
+import hashlib
+import hmac
+import io
 import json
-from datetime import datetime
-import uuid
 import random
 import re
-import google.generativeai as genai
+import threading
+import time
 from dotenv import load_dotenv
+from catalog import CatalogStore
+from context import build_prompt
+from eventlog import event_log
+from fastjson import FastJSONProvider, encode, raw_json_response
+from llm import create_model
+from precache import PrecacheManifest, INDEX_URL, OFFLINE_CATALOG_URL, offline_catalog
+from metrics import registry, REQUEST_SECONDS, STAGE_SECONDS, EMERGENCY_TYPES, LLM_REQUESTS, CACHE_REQUESTS, LOG_RECORDS, TRANSCRIPT_RECORDS
+from profiling import RequestProfiler, MemoryTracker
+from render import render_html_cached, minify_inline_styles
+from protocols import PROTOCOL_MAP
+from sessions import SessionStore, SESSION_DIR
+from search import build_index, format_search_reply, REPLY_CANDIDATES
+from timeseries import RollingCounts, RESOLUTIONS
+from transcript import transcript_log
 
-load_dotenv()
+bp = Blueprint('responder', __name__)
 
-app = Flask(__name__)
-app.secret_key = 'emergency_secret_key'
+# Defaults for create_app(); unset values are read from the environment
+DEFAULT_CONFIG = {
+    'SECRET_KEY': 'emergency_secret_key',
+    # Reject oversized request bodies before they are parsed
+    'MAX_CONTENT_LENGTH': 64 * 1024,
+    'GEMINI_API_KEY': None,
+    'LLM_BACKEND': None,
+    # Build the LLM client in a background thread at startup instead of on first use
+    'LLM_WARMUP': False,
+    # Estimated tokens of conversation history sent with each LLM prompt (see context.py)
+    'LLM_CONTEXT_TOKENS': 1024,
+    # Chat sessions shared by all worker processes (see sessions.py); SESSION_DIR from the environment when unset
+    'SESSION_DIR': None,
+    # Admin endpoints and profiling headers are disabled unless a token is set
+    'ADMIN_TOKEN': None,
+    # WebSocket chat endpoint served by realtime.py, e.g. ws://localhost:5001/ws
+    # (or :5001/ws for the page's own host); the page falls back to HTTP when unset
+    'REALTIME_URL': None,
+    'LOAD_DOTENV': True,
+    # Serve the index page with minified inline CSS and main.js inlined, loading
+    # face-api and the camera code only when the camera is turned on
+    'INLINE_ASSETS': False,
+    # Compile tables and templates before serving (see warm_up)
+    'WARM_UP': True,
+    # Set by the prefork launcher: per-process threads start in each worker instead
+    'PRELOAD': False
+}
 
-# Configure Gemini AI
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY and GEMINI_API_KEY != 'your_gemini_api_key_here':
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        model = genai.GenerativeModel('gemini-pro')
-        print("✅ Gemini AI configured successfully")
-    except Exception as e:
-        print(f"⚠️  Gemini AI configuration error: {e}")
-        model = None
-else:
-    print("⚠️  GEMINI_API_KEY not configured. Using emergency protocols only.")
-    model = None
-
-# Store chat history
-chat_sessions = {}
-
-# Emergency detection keywords
-EMERGENCY_KEYWORDS = {
-    'choking': ['choking', 'choke', 'cant breathe', 'airway', 'heimlich', 'throat', 'suffocating'],
-    'cardiac': ['heart', 'cardiac', 'chest pain', 'heart attack', 'no pulse', 'arrest', 'cpr', 'chest'],
-    'bleeding': ['bleeding', 'blood', 'cut', 'wound', 'hemorrhage', 'arterial', 'bleed', 'injured'],
-    'unconscious': ['unconscious', 'passed out', 'fainted', 'not responding', 'collapsed', 'unresponsive'],
-    'snake': ['snake', 'bite', 'venom', 'snake bite', 'fang', 'reptile'],
-    'burn': ['burn', 'fire', 'hot', 'scald', 'heat injury', 'flame', 'burned'],
-    'fracture': ['fracture', 'broken', 'bone', 'break', 'fractured', 'snapped', 'limb'],
-    'drowning': ['drowning', 'water', 'swimming', 'pool', 'lake', 'river', 'underwater'],
-    'road_accident': ['road accident', 'car accident', 'traffic accident', 'vehicle crash', 'car crash', 'road crash', 'motor accident', 'collision', 'hit and run', 'vehicular'],
-    'emergency': ['help', 'emergency', 'urgent', 'assist', 'accident', 'injured', '911', '108', '112', 'ambulance']
+UNIVERSAL_REPLY = "🚨 **EMERGENCY DETECTED** 🚨\n\n**📞 CALL 108/112 IMMEDIATELY**\n\nPlease describe the situation so I can provide specific guidance. Are you dealing with:\n• Cardiac emergency\n• Severe bleeding\n• Choking\n• Unconscious person\n• Burn injury\n• Snake bite\n• Fracture/broken bone\n• Road/vehicle accident"
+
+# Answered by the service worker when offline and no protocol matches; {examples} is filled in by offline_catalog
+OFFLINE_REPLY = "📴 **You're offline.** I can still show saved first aid steps: describe the emergency (for example {examples}).\n\n**📞 For real emergencies, call 108/112.**"
+
+ENDPOINT_BODY_LIMITS = {
+    'responder.ai_detection': 16 * 1024
 }
 
-# Emergency protocols
-# In app.py, update the EMERGENCY_PROTOCOLS dictionary:
-
-EMERGENCY_PROTOCOLS = {
-    # ... existing protocols ...
-    
-    'burn': [
-        "🚨 **BURN INJURY - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 for serious burns**",
-        "**STEP 2: Remove person from heat source immediately.**",
-        "**STEP 3: Cool burn with cool running water for 20 minutes.**",
-        "**STEP 4: Remove jewelry and tight clothing near burn.**",
-        "**STEP 5: Cover with sterile non-stick dressing.**",
-        "**STEP 6: DO NOT apply ointments, butter, toothpaste or ice.**",
-        "**STEP 7: DO NOT break blisters.**",
-        "**STEP 8: Keep victim warm and monitor for shock.**",
-        "**STEP 9: For chemical burns, remove contaminated clothing and rinse with water.**"
-    ],
-    
-    'pain': [
-        "🚨 **SEVERE PAIN/DISTRESS - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 if pain is severe or sudden**",
-        "**STEP 2: Assess the source of pain.**",
-        "**STEP 3: Help person into comfortable position.**",
-        "**STEP 4: Apply cold pack for injuries (20 minutes on, 20 off)**",
-        "**STEP 5: For chest pain, help person sit up and rest.**",
-        "**STEP 6: For abdominal pain, do NOT give food or drink.**",
-        "**STEP 7: Monitor breathing and consciousness.**",
-        "**STEP 8: Keep person calm and reassure them.**",
-        "**STEP 9: Be prepared to provide CPR if needed.**"
-    ],
-    
-    'choking': [
-        "🚨 **CHOKING EMERGENCY - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 IMMEDIATELY**",
-        "**STEP 2: Ask 'Are you choking?' If they can cough, encourage coughing.**",
-        "**STEP 3: Perform 5 back blows:**",
-        "   - Stand behind and slightly to the side",
-        "   - Support chest with one hand",
-        "   - Lean person forward",
-        "   - Give 5 firm blows between shoulder blades",
-        "**STEP 4: Perform Heimlich Maneuver:**",
-        "   - Stand behind, wrap arms around waist",
-        "   - Make fist, place thumb side above navel",
-        "   - Grasp fist with other hand",
-        "   - Give quick upward thrusts",
-        "**STEP 5: Alternate 5 back blows and 5 abdominal thrusts.**",
-        "**STEP 6: If person becomes unconscious, begin CPR.**"
-    ],
-    
-    'cardiac': [
-        "🚨 **CARDIAC SYMPTOMS - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 IMMEDIATELY**",
-        "**STEP 2: Check for chest pain, pressure, or discomfort.**",
-        "**STEP 3: Check for pain in arms, back, neck, jaw, or stomach.**",
-        "**STEP 4: Look for shortness of breath, cold sweat, nausea.**",
-        "**STEP 5: Help person sit in comfortable position.**",
-        "**STEP 6: Loosen tight clothing.**",
-        "**STEP 7: If prescribed, help with nitroglycerin.**",
-        "**STEP 8: Do NOT give aspirin unless directed by medical professional.**",
-        "**STEP 9: Monitor closely and be prepared for CPR.**",
-        "**STEP 10: Use AED if available and person becomes unconscious.**"
-    ],
-    
-    'head_injury': [
-        "🚨 **HEAD INJURY SUSPECTED - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 IMMEDIATELY**",
-        "**STEP 2: DO NOT move person unless absolutely necessary.**",
-        "**STEP 3: Stabilize head and neck in position found.**",
-        "**STEP 4: Check for consciousness and breathing.**",
-        "**STEP 5: Control any bleeding with gentle pressure.**",
-        "**STEP 6: Watch for:**",
-        "   - Confusion or disorientation",
-        "   - Unequal pupil size",
-        "   - Clear fluid from nose or ears",
-        "   - Seizures or convulsions",
-        "**STEP 7: Keep person still and calm.**",
-        "**STEP 8: Do NOT remove helmet if present.**",
-        "**STEP 9: Monitor closely until help arrives.**"
-    ],
-    
-    'unconscious': [
-        "🚨 **UNCONSCIOUS PERSON - ACT NOW** 🚨",
-        "**📞 STEP 1: CALL 108/112 IMMEDIATELY**",
-        "**STEP 2: Check responsiveness - tap shoulders and shout.**",
-        "**STEP 3: Open airway - tilt head back, lift chin.**",
-        "**STEP 4: Check breathing - look, listen, feel for 10 seconds.**",
-        "**STEP 5: If breathing normally, place in recovery position.**",
-        "**STEP 6: If NOT breathing, begin CPR immediately:**",
-        "   - 30 chest compressions (5-6 cm deep)",
-        "   - 2 rescue breaths",
-        "   - Continue 30:2 ratio",
-        "**STEP 7: Use AED if available.**",
-        "**STEP 8: Monitor breathing until help arrives.**"
-    ]
+# Compiled tables shared by every app in the process (see get_catalog_store)
+_shared_lock = threading.Lock()
+_catalog_store = None
+_search_index = None
+_emergency_rates = None
+_offline_catalog = (None, None)
+
+def get_catalog_store():
+    """
+    Emergency keywords, protocols and guide images compiled from data/
+    into a snapshot that is hot-reloaded when it changes (see catalog.py)
+    """
+    global _catalog_store
+    if _catalog_store is None:
+        with _shared_lock:
+            if _catalog_store is None:
+                _catalog_store = CatalogStore()
+    return _catalog_store
+
+def get_search_index():
+    """Full-text index over all BCLS protocol steps, built once per process"""
+    global _search_index
+    if _search_index is None:
+        with _shared_lock:
+            if _search_index is None:
+                _search_index = build_index()
+    return _search_index
+
+def get_emergency_rates():
+    """
+    Live emergency-type counts per second, minute and hour
+    Shared with the other workers on the host through METRICS_DIR
+    """
+    global _emergency_rates
+    if _emergency_rates is None:
+        # Outside the lock: get_catalog_store() takes it when the store isn't loaded yet
+        snapshot = get_catalog_store().current()
+        with _shared_lock:
+            if _emergency_rates is None:
+                types = [name for name, keywords in snapshot['keywords'] if name != 'emergency']
+                types += list(PROTOCOL_MAP) + list(snapshot['protocols']) + ['casual']
+                _emergency_rates = RollingCounts(dict.fromkeys(types), directory=registry.metrics_dir)
+    return _emergency_rates
+
+def flush_emergency_rates():
+    """Write the live counts to METRICS_DIR before the process exits"""
+    if _emergency_rates is not None:
+        _emergency_rates.flush()
+
+def _reset_emergency_rates():
+    if _emergency_rates is not None:
+        _emergency_rates.after_fork()
+
+os.register_at_fork(after_in_child=_reset_emergency_rates)
+
+def get_offline_catalog():
+    """Offline catalog JSON for the service worker, built once per catalog snapshot"""
+    global _offline_catalog
+    snapshot = get_catalog_store().current()
+    built_from, data = _offline_catalog
+    if built_from is not snapshot:
+        data = offline_catalog(snapshot, UNIVERSAL_REPLY, OFFLINE_REPLY)
+        _offline_catalog = (snapshot, data)
+    return data
+
+class ResponderState:
+    """Per-app state: chat sessions, the lazily created LLM client and profiling hooks"""
     
-    # ... rest of protocols ...
-}
+    def __init__(self, config):
+        self.config = config
+        # Chat history and token-budgeted LLM context per session, on disk for every worker
+        self.sessions = SessionStore(config.get('SESSION_DIR') or SESSION_DIR,
+                                     context_tokens=int(config.get('LLM_CONTEXT_TOKENS') or 0))
+        # Offline precache manifest, set by create_app
+        self.precache = None
+        # Rendered index page and its ETag (see get_index_page)
+        self.index_page = None
+        # On-demand profiling of live requests
+        self.request_profiler = RequestProfiler()
+        self.memory_tracker = MemoryTracker()
+        self._model = None
+        self._model_ready = False
+        self._model_lock = threading.Lock()
+        # Readiness: set once warm_up() has finished, cleared while shutting down
+        self.warmed = False
+        self.warmup_ms = None
+        self.draining = False
+    
+    def get_model(self):
+        """Gemini (or the LLM_BACKEND stand-in), imported and configured on first use"""
+        if not self._model_ready:
+            with self._model_lock:
+                if not self._model_ready:
+                    self._model = create_model(backend=self.config.get('LLM_BACKEND'),
+                                               api_key=self.config.get('GEMINI_API_KEY'))
+                    self._model_ready = True
+        return self._model
+    
+    def warm_model(self):
+        """Create the LLM client in the background so the first casual message doesn't wait"""
+        threading.Thread(target=self.get_model, name='llm-warmup', daemon=True).start()
+    
+    def conversation_context(self, session_id):
+        """The session's stored LLM context"""
+        return self.sessions.load(session_id).context
+    
+    def reset_session(self, session_id):
+        self.sessions.reset(session_id)
+    
+    def readiness(self):
+        """Warm-up state of this process, reported by /ready"""
+        if not self.config.get('LLM_WARMUP'):
+            llm = 'lazy'
+        else:
+            llm = 'ready' if self._model_ready else 'warming'
+        if self.draining:
+            status = 'draining'
+        elif self.warmed and llm != 'warming':
+            status = 'ready'
+        else:
+            status = 'warming'
+        return {
+            'status': status,
+            'pid': os.getpid(),
+            'warmed': self.warmed,
+            'warmup_ms': self.warmup_ms,
+            'llm': llm
+        }
+
+def get_state():
+    return current_app.extensions['neonexus']
+
+def collect_cache_metrics():
+    """Copy render cache statistics into the cache counters"""
+    info = render_html_cached.cache_info()
+    CACHE_REQUESTS.set(info.hits, 'render', 'hit')
+    CACHE_REQUESTS.set(info.misses, 'render', 'miss')
+
+registry.add_collector(collect_cache_metrics)
+
+def collect_log_metrics():
+    """Copy event log drop and sampling counts into the log counters"""
+    stats = event_log.stats()
+    LOG_RECORDS.set(stats['written'], 'all', 'written')
+    for result in ('dropped', 'sampled_out'):
+        for category, count in stats[result].items():
+            LOG_RECORDS.set(count, category, result)
+
+registry.add_collector(collect_log_metrics)
+
+def collect_transcript_metrics():
+    """Copy transcript writer totals into the transcript counter"""
+    stats = transcript_log.stats()
+    TRANSCRIPT_RECORDS.set(stats['written'], 'written')
+    TRANSCRIPT_RECORDS.set(stats['dropped'], 'dropped')
+    TRANSCRIPT_RECORDS.set(stats['commits'], 'commit')
+
+registry.add_collector(collect_transcript_metrics)
+
+def read_limited(stream, limit):
+    """At most limit + 1 bytes of a streamed body, enough to tell whether it is over the limit"""
+    chunks = []
+    size = 0
+    while size <= limit:
+        chunk = stream.read(limit + 1 - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b''.join(chunks)
+
+def is_admin_request():
+    """Check the admin token header against ADMIN_TOKEN"""
+    admin_token = current_app.config.get('ADMIN_TOKEN')
+    token = request.headers.get('X-Admin-Token', '')
+    # compare_digest only accepts ASCII str, so compare bytes
+    return bool(admin_token) and hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
 
 def detect_emergency_type(message):
     """Detect emergency type from user message"""
     message_lower = message.lower()
     
-    for emergency_type, keywords in EMERGENCY_KEYWORDS.items():
+    for emergency_type, keywords in get_catalog_store().current()['keywords']:
         for keyword in keywords:
             if keyword in message_lower:
                 return emergency_type
     
     return None
 
-def get_ai_response(message, session_id, conversation_history):
-    """Get response from Gemini AI or fallback to emergency protocols"""
+def get_protocol_reply_prefix(response, emergency_type):
+    """Pre-encoded reply start (text and HTML) if the response is a compiled protocol"""
+    snapshot = get_catalog_store().current()
+    if snapshot['protocol_text'].get(emergency_type) == response:
+        CACHE_REQUESTS.inc('protocol_html', 'hit')
+        return snapshot['protocol_reply_prefix'][emergency_type]
+    return None
+
+def get_ai_response(message, session_id, conversation_history, trace=None):
+    """
+    Get response from Gemini AI or fallback to emergency protocols
+    The LLM path reads the session's context from the session store, so
+    conversation_history is unused (None from the chat routes)
+    trace, if given, receives the path that produced the reply under 'route':
+    protocol, universal, search, llm or fallback
+    """
+    if trace is None:
+        trace = {}
     
     # First check for emergencies
-    emergency_type = detect_emergency_type(message)
+    with STAGE_SECONDS.time('classify'):
+        emergency_type = detect_emergency_type(message)
     
     if emergency_type and emergency_type != 'emergency':
         # This is a specific emergency
-        protocol = EMERGENCY_PROTOCOLS.get(emergency_type, [])
-        return "\n".join(protocol), emergency_type
+        trace['route'] = 'protocol'
+        return get_catalog_store().current()['protocol_text'].get(emergency_type, ''), emergency_type
     
     elif emergency_type == 'emergency':
         # General emergency
-        return "🚨 **EMERGENCY DETECTED** 🚨\n\n**📞 CALL 108/112 IMMEDIATELY**\n\nPlease describe the situation so I can provide specific guidance. Are you dealing with:\n• Cardiac emergency\n• Severe bleeding\n• Choking\n• Unconscious person\n• Burn injury\n• Snake bite\n• Fracture/broken bone\n• Road/vehicle accident", 'universal'
+        trace['route'] = 'universal'
+        return UNIVERSAL_REPLY, 'universal'
+    
+    # Look up matching protocol steps before reaching the LLM
+    with STAGE_SECONDS.time('search'):
+        search_reply = format_search_reply(get_search_index().search(message, REPLY_CANDIDATES))
+    if search_reply:
+        trace['route'] = 'search'
+        return search_reply
     
     # Casual conversation or non-emergency
+    model = get_state().get_model()
     if model:
         try:
-            # Use Gemini AI for casual conversation
-            prompt = f"""You are Neonexus First Responder, an emergency medical assistant. 
-            User message: {message}
-            
-            Respond in a helpful, professional manner. If it's a casual greeting or question, respond warmly.
-            If it's asking about first aid or safety, provide helpful information.
-            Always remind about calling 108/112 for real emergencies.
-            
-            Keep response concise and practical."""
+            # Use Gemini AI for casual conversation; history is summarized to fit the token budget
+            with STAGE_SECONDS.time('context'):
+                prompt = build_prompt(get_state().conversation_context(session_id), message)
             
-            response = model.generate_content(prompt)
+            with STAGE_SECONDS.time('llm'):
+                response = model.generate_content(prompt)
+            LLM_REQUESTS.inc('success')
+            trace['route'] = 'llm'
             return response.text, 'casual'
         except Exception as e:
-            print(f"Gemini AI error: {e}")
+            LLM_REQUESTS.inc('failure')
+            event_log.error('llm', 'gemini_error', error=str(e), error_type=type(e).__name__)
     
     # Fallback responses
+    LLM_REQUESTS.inc('fallback')
+    trace['route'] = 'fallback'
     message_lower = message.lower()
     
     # Greetings
@@ -227,122 +351,207 @@ def get_ai_response(message, session_id, conversation_history):
     ]
     return random.choice(default_responses), 'casual'
 
+def store_turn(session_id, user_message, response, emergency_type=None):
+    """
+    Append a user/assistant exchange to the shared session history, keeping the last 20 entries,
+    and fold it into the session's LLM context
+    """
+    with get_state().sessions.update(session_id) as session:
+        session.add_turn(user_message, response, emergency_type)
+
+def count_emergency(emergency_type):
+    """Count a reply's emergency type in the metrics and the live time buckets"""
+    EMERGENCY_TYPES.inc(emergency_type)
+    get_emergency_rates().inc(emergency_type)
+
+def record_turn(channel, session_id, user_message, response, emergency_type, trace):
+    """
+    Append a chat turn to the transcript log
+    Compiled protocol replies are stored by emergency type only; their text is in the catalog
+    """
+    route = trace.get('route')
+    transcript_log.record('turn', session_id=session_id, channel=channel, message=user_message,
+                          emergency_type=emergency_type, route=route,
+                          response=None if route in ('protocol', 'universal') else response)
+
 # ===== FLASK ROUTES =====
-@app.route('/')
+@bp.before_app_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    STAGE_SECONDS.begin_request()
+    
+    # Declared body too large: reject without reading it
+    limit = ENDPOINT_BODY_LIMITS.get(request.endpoint, current_app.config['MAX_CONTENT_LENGTH'])
+    if request.content_length and request.content_length > limit:
+        return request_too_large(None)
+    # Chunked body to a limited endpoint: read at most limit + 1 bytes, reject it if
+    # more arrived, otherwise hand the view the body with its length known
+    if (request.content_length is None and request.endpoint in ENDPOINT_BODY_LIMITS
+            and 'wsgi.input_terminated' in request.environ):
+        body = read_limited(request.environ['wsgi.input'], limit)
+        if len(body) > limit:
+            return request_too_large(None)
+        request.environ['wsgi.input'] = io.BytesIO(body)
+        request.environ['CONTENT_LENGTH'] = str(len(body))
+    
+    # X-Profile-Requests: N (with the admin token) profiles this and the next N-1 requests
+    request_profiler = get_state().request_profiler
+    profile_requests = request.headers.get('X-Profile-Requests', type=int)
+    if profile_requests and is_admin_request():
+        request_profiler.arm(requests=profile_requests)
+    
+    if request_profiler.should_profile():
+        g.profile = request_profiler.start()
+
+@bp.after_app_request
+def record_request_latency(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        get_state().request_profiler.stop(profile)
+    
+    start = g.get('request_start')
+    if start is not None:
+        total = time.perf_counter() - start
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(total, route, request.method)
+        
+        timings = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in STAGE_SECONDS.end_request().items()]
+        timings.append(f"total;dur={total * 1000:.3f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
+def render_index(app):
+    """The index page as served by /"""
+    inline_assets = app.config['INLINE_ASSETS']
+    main_js = None
+    if inline_assets:
+        with open(os.path.join(app.static_folder, 'js', 'main.js'), encoding='utf-8') as f:
+            main_js = f.read()
+    with app.app_context():
+        page = render_template('index.html', realtime_url=app.config['REALTIME_URL'],
+                               inline_assets=inline_assets, main_js=main_js)
+    if inline_assets:
+        page = minify_inline_styles(page)
+    return page.encode('utf-8')
+
+def get_index_page(app):
+    """
+    Rendered index page and its strong ETag
+    The page only changes between deploys, so it is rendered once per process
+    (on every request in debug mode, to pick up template edits)
+    """
+    state = app.extensions['neonexus']
+    page = state.index_page
+    if page is None or app.debug:
+        body = render_index(app)
+        page = state.index_page = (body, hashlib.sha256(body).hexdigest()[:32])
+    return page
+
+@bp.route('/')
 def index():
-    return render_template('index.html')
+    body, etag = get_index_page(current_app._get_current_object())
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    # Revalidate on every visit; unchanged pages cost a 304 with no body
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
-@app.route('/static/models/<path:filename>')
+@bp.route('/precache-manifest.json')
+def precache_manifest():
+    """URLs, hashes and sizes the service worker precaches for offline use"""
+    response = raw_json_response(get_state().precache.current())
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route('/sw.js')
+def service_worker():
+    """Service worker at the root so it controls the whole app"""
+    response = Response(get_state().precache.service_worker(), mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@bp.route(OFFLINE_CATALOG_URL)
+def offline_catalog_data():
+    """Keywords, protocols and images for on-device lookups"""
+    return raw_json_response(get_offline_catalog())
+
+@bp.route('/static/models/<path:filename>')
 def serve_models(filename):
     """Serve face-api.js model files"""
     try:
         return send_from_directory('static/models', filename)
     except Exception as e:
-        print(f"Error serving model file {filename}: {e}")
+        event_log.warning('static', 'model_file_error', filename=filename, error=str(e))
         return "File not found", 404
 
-@app.route('/static/js/face-api.min.js')
+@bp.route('/static/js/face-api.min.js')
 def serve_face_api():
     """Serve face-api.js file"""
     return send_from_directory('static/js', 'face-api.min.js')
 
-@app.route('/send_message', methods=['POST'])
+@bp.route('/send_message', methods=['POST'])
 def send_message():
     try:
-        data = request.json
-        user_message = data.get('message', '').strip()
-        session_id = data.get('session_id')
+        with STAGE_SECONDS.time('parse'):
+            data = request.json
+            user_message = data.get('message', '').strip()
+            session_id = data.get('session_id')
         
         if not user_message:
             return jsonify({'status': 'error', 'response': 'Please type a message.'})
         
-        # Initialize or get session
-        if not session_id or session_id not in chat_sessions:
-            session_id = str(uuid.uuid4())
-            chat_sessions[session_id] = []
+        # Initialize or get session; the client's id is kept so every worker and the realtime server agree on it
+        sessions = get_state().sessions
+        session_start = time.perf_counter()
+        session_id = sessions.resolve(session_id)
+        session_seconds = time.perf_counter() - session_start
         
         # Get response from AI or emergency protocols
-        response, emergency_type = get_ai_response(user_message, session_id, chat_sessions[session_id])
-        
-        # Store in session history
-        chat_sessions[session_id].append({
-            'sender': 'user',
-            'message': user_message,
-            'timestamp': datetime.now().isoformat()
-        })
+        trace = {}
+        response, emergency_type = get_ai_response(user_message, session_id, None, trace)
+        count_emergency(emergency_type)
+        record_turn('http', session_id, user_message, response, emergency_type, trace)
         
-        chat_sessions[session_id].append({
-            'sender': 'assistant',
-            'message': response,
-            'timestamp': datetime.now().isoformat()
-        })
+        history_start = time.perf_counter()
+        store_turn(session_id, user_message, response, emergency_type)
+        STAGE_SECONDS.observe(session_seconds + time.perf_counter() - history_start, 'session')
         
-        # Limit history
-        if len(chat_sessions[session_id]) > 20:
-            chat_sessions[session_id] = chat_sessions[session_id][-20:]
+        with STAGE_SECONDS.time('render'):
+            reply_prefix = get_protocol_reply_prefix(response, emergency_type)
+            response_html = None if reply_prefix else render_html_cached(response)
         
-        return jsonify({
-            'status': 'success',
-            'response': response,
-            'session_id': session_id,
-            'emergency_type': emergency_type if emergency_type != 'casual' else None
-        })
+        with STAGE_SECONDS.time('serialize'):
+            if reply_prefix:
+                # Protocol text and HTML are already encoded in the catalog
+                return raw_json_response(reply_prefix + b'"session_id":' + encode(session_id) +
+                                         b',"status":"success"}')
+            return jsonify({
+                'status': 'success',
+                'response': response,
+                'response_html': response_html,
+                'session_id': session_id,
+                'emergency_type': emergency_type if emergency_type != 'casual' else None
+            })
         
     except Exception as e:
-        print(f"Error in send_message: {e}")
+        event_log.error('chat', 'send_message_error', error=str(e), error_type=type(e).__name__)
         return jsonify({
             'status': 'error',
             'response': 'System error. Please try again or call 108/112 for emergencies.'
         })
 
-@app.route('/get_emergency_images/<emergency_type>')
+@bp.route('/get_emergency_images/<emergency_type>')
 def get_emergency_images(emergency_type):
     """Get images for specific emergency type"""
     
-    image_map = {
-        'choking': [
-            {'filename': 'back blows.jpg', 'title': 'Back Blows', 'description': '5 firm blows between shoulder blades'},
-            {'filename': 'heimlich maneuver.jpg', 'title': 'Heimlich Maneuver', 'description': 'Abdominal thrusts above navel'}
-        ],
-        'cardiac': [
-            {'filename': 'cpr being performed.jpg', 'title': 'CPR Compressions', 'description': 'Center of chest, 5-6 cm depth'},
-            {'filename': 'using AED device.jpg', 'title': 'AED Use', 'description': 'Attach pads, follow voice prompts'}
-        ],
-        'bleeding': [
-            {'filename': 'applying pressure to wound.jpg', 'title': 'Direct Pressure', 'description': 'Apply firm pressure with clean cloth'},
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call Emergency', 'description': 'Dial 108/112 immediately'}
-        ],
-        'unconscious': [
-            {'filename': 'cpr being performed.jpg', 'title': 'Check Breathing', 'description': 'Look, listen, feel for 10 seconds'},
-            {'filename': 'recovery position.jpg', 'title': 'Recovery Position', 'description': 'Place on side if breathing'}
-        ],
-        'snake': [
-            {'filename': 'snake bite immobilzation.jpg', 'title': 'Immobilize Limb', 'description': 'Keep still, below heart level'},
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call 108/112', 'description': 'Hospital transport needed'}
-        ],
-        'burn': [
-            {'filename': 'cooling burn with water.jpg', 'title': 'Cool Burn', 'description': 'Run cool water for 20 minutes'},
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call 108/112', 'description': 'For serious burns'}
-        ],
-        'fracture': [
-            {'filename': 'splinting fracture.jpg', 'title': 'Immobilize Fracture', 'description': 'Support with splint'},
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call 108/112', 'description': 'For major fractures'}
-        ],
-        'road_accident': [
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call Emergency Immediately', 'description': 'Dial 108/112 with location details'},
-            {'filename': 'cpr being performed.jpg', 'title': 'Assess & Provide First Aid', 'description': 'Check breathing, control bleeding'},
-            {'filename': 'recovery position.jpg', 'title': 'Scene Safety First', 'description': 'Secure area, prevent further accidents'}
-        ],
-        'universal': [
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Call Emergency', 'description': 'Dial 108/112 first'},
-            {'filename': 'cpr being performed.jpg', 'title': 'Check Responsiveness', 'description': 'Tap shoulders, shout for response'}
-        ],
-        'casual': [
-            {'filename': 'person calling emergencyy.jpg', 'title': 'Emergency Ready', 'description': 'Always call 108/112 for emergencies'},
-            {'filename': 'cpr being performed.jpg', 'title': 'First Aid Knowledge', 'description': 'Basic first aid saves lives'}
-        ]
-    }
+    snapshot = get_catalog_store().current()
     
+    # Known types are pre-encoded in the catalog
+    images_json = snapshot['images_json'].get(emergency_type)
+    if images_json:
+        return raw_json_response(images_json)
+    
+    image_map = snapshot['images']
     images = image_map.get(emergency_type, image_map['casual'])
     
     return jsonify({
@@ -351,29 +560,178 @@ def get_emergency_images(emergency_type):
         'images': images
     })
 
-@app.route('/ai_detection', methods=['POST'])
+@bp.route('/search_protocols')
+def search_protocols():
+    """Full-text search over all protocol steps"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 5, type=int), 50))
+    
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Please provide a search query.'})
+    
+    return jsonify({
+        'status': 'success',
+        'query': query,
+        'results': get_search_index().search(query, limit)
+    })
+
+@bp.route('/catalog')
+def catalog_info():
+    """Version, load time and size of the loaded catalog snapshot"""
+    return jsonify({'status': 'success', 'catalog': get_catalog_store().stats(),
+                    'precache': get_state().precache.stats()})
+
+@bp.route('/stats')
+def live_stats():
+    """Emergency types over the last N seconds, minutes or hours, summed over all workers"""
+    slots = {name: kept for name, width, kept in RESOLUTIONS}
+    resolution = request.args.get('resolution', 'minute')
+    if resolution not in slots:
+        return jsonify({'status': 'error', 'message': f"resolution must be one of {', '.join(slots)}"}), 400
+    windows = max(1, min(request.args.get('windows', 60, type=int), slots[resolution]))
+    return jsonify({'status': 'success', **get_emergency_rates().windows(resolution, windows)})
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus text exposition, merged across workers sharing METRICS_DIR"""
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """Profile the next N requests or a time window; GET returns the status"""
+    if not is_admin_request():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    
+    request_profiler = get_state().request_profiler
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        status = request_profiler.arm(requests=data.get('requests'), seconds=data.get('seconds'))
+    else:
+        status = request_profiler.status()
+    return jsonify({'status': 'success', 'profiler': status})
+
+@bp.route('/admin/memory', methods=['GET', 'POST'])
+def admin_memory():
+    """tracemalloc growth since the baseline; POST {"action": "start"|"stop"} controls tracing"""
+    if not is_admin_request():
+        return jsonify({'status': 'error', 'message': 'Forbidden'}), 403
+    
+    state = get_state()
+    memory_tracker = state.memory_tracker
+    if request.method == 'POST':
+        action = (request.get_json(silent=True) or {}).get('action', 'start')
+        if action == 'stop':
+            memory_tracker.stop()
+            return jsonify({'status': 'success', 'message': 'Memory tracing stopped'})
+        memory_tracker.start()
+        return jsonify({'status': 'success', 'message': 'Memory baseline taken'})
+    
+    report = memory_tracker.report(top=request.args.get('top', 20, type=int))
+    if report is None:
+        return jsonify({'status': 'error', 'message': 'Memory tracing not started. POST to start.'})
+    # Sessions live on disk, shared by all workers
+    report['chat_sessions'] = state.sessions.stats()
+    return jsonify({'status': 'success', 'memory': report})
+
+@bp.route('/ai_detection', methods=['POST'])
 def ai_detection():
     """Receive AI detection alerts"""
     try:
         data = request.json
-        print(f"🤖 AI DETECTION: {data}")
+        event_log.info('ai_detection', 'detection', payload=data)
+        transcript_log.record('detection', session_id=data.get('session_id'), channel='http', payload=data)
         return jsonify({'status': 'success', 'ai': True})
     except Exception as e:
-        print(f"Error processing AI detection: {e}")
+        event_log.error('ai_detection', 'detection_error', error=str(e))
         return jsonify({'status': 'error', 'message': str(e)})
 
-@app.route('/reset_session', methods=['POST'])
+@bp.route('/ready')
+def ready():
+    """Readiness probe: 200 once this worker is warmed up, 503 while warming or draining"""
+    report = get_state().readiness()
+    return jsonify(report), 200 if report['status'] == 'ready' else 503
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({'status': 'error', 'message': 'Request body too large'}), 413
+
+@bp.route('/reset_session', methods=['POST'])
 def reset_session():
     session_id = request.json.get('session_id')
-    if session_id in chat_sessions:
-        chat_sessions[session_id] = []
+    state = get_state()
+    state.reset_session(session_id)
     return jsonify({'status': 'success', 'message': 'Session reset'})
 
+def warm_up(app):
+    """
+    Load everything the first request would otherwise pay for: the catalog
+    snapshot, search index, HTML render cache, classifier, rendered index page
+    and precache manifest hashes
+    Run in the prefork parent so workers inherit the results copy-on-write
+    """
+    start = time.perf_counter()
+    state = app.extensions['neonexus']
+    snapshot = get_catalog_store().current()
+    index = get_search_index()
+    for emergency_type, keywords in snapshot['keywords']:
+        detect_emergency_type(keywords[0])
+        search_reply = format_search_reply(index.search(keywords[0], REPLY_CANDIDATES))
+        if search_reply:
+            render_html_cached(search_reply[0])
+    get_index_page(app)
+    state.precache.current()
+    state.warmup_ms = round((time.perf_counter() - start) * 1000, 2)
+    state.warmed = True
+
+def start_background_tasks(app):
+    """Per-process threads: metrics sharing, the event log writer and LLM warm-up"""
+    registry.start_flushing()
+    event_log.start()
+    transcript_log.start()
+    get_emergency_rates()
+    if app.config['LLM_WARMUP']:
+        app.extensions['neonexus'].warm_model()
+
+def create_app(config=None):
+    """
+    Create the Flask app
+    Nothing network-related is imported here: the LLM client is built on first
+    use (or in the background with LLM_WARMUP), and the compiled catalog and
+    search index are shared by every app in the process
+    """
+    config = dict(config or {})
+    if config.get('LOAD_DOTENV', DEFAULT_CONFIG['LOAD_DOTENV']):
+        load_dotenv()
+    
+    app = Flask(__name__)
+    app.config.update(DEFAULT_CONFIG)
+    for key in ('GEMINI_API_KEY', 'LLM_BACKEND', 'ADMIN_TOKEN', 'REALTIME_URL'):
+        app.config[key] = os.getenv(key)
+    if os.getenv('LLM_CONTEXT_TOKENS'):
+        app.config['LLM_CONTEXT_TOKENS'] = int(os.getenv('LLM_CONTEXT_TOKENS'))
+    for key in ('LLM_WARMUP', 'INLINE_ASSETS'):
+        app.config[key] = os.getenv(key, '').lower() in ('1', 'true', 'yes')
+    app.config.update(config)
+    
+    app.json = FastJSONProvider(app)
+    state = ResponderState(app.config)
+    state.precache = PrecacheManifest({INDEX_URL: lambda: get_index_page(app)[0],
+                                       OFFLINE_CATALOG_URL: get_offline_catalog})
+    app.extensions['neonexus'] = state
+    app.register_blueprint(bp)
+    
+    if app.config['WARM_UP']:
+        warm_up(app)
+    if not app.config['PRELOAD']:
+        start_background_tasks(app)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
     print("=" * 60)
     print("🆘 NEONEXUS FIRST RESPONDER")
     print("=" * 60)
-    if model:
+    if app.extensions['neonexus'].get_model():
         print("✅ Gemini AI: Connected")
     else:
         print("✅ Emergency Protocols: Ready")
@@ -382,4 +740,4 @@ if __name__ == '__main__':
     print("\n🚑 Server running: http://localhost:5000")
     print("📞 Remember: Always call 108/112 for real emergencies!")
     print("=" * 60)
-    app.run(debug=True, port=5000, host='0.0.0.0')
\ No newline at end of file
+    app.run(debug=True, port=5000, host='0.0.0.0')
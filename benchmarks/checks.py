@@ -0,0 +1,244 @@
+"""
+Behaviour Checks
+Fast end-to-end checks of regressions that benchmarks alone wouldn't catch,
+run by benchmarks/run.py before it measures anything
+
+Usage:
+    python benchmarks/checks.py
+
+Runs in a fresh process so the cold paths (nothing compiled or loaded yet)
+are the ones exercised. Logs, transcripts, metrics, sessions and profiles go
+to a temporary directory, never to the repository's own logs/ and transcripts/.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='neonexus-checks-')
+os.environ['GEMINI_API_KEY'] = ''
+os.environ['TRANSCRIPT_DIR'] = os.path.join(SCRATCH_DIR, 'transcripts')
+os.environ['LOG_FILE'] = os.path.join(SCRATCH_DIR, 'logs', 'events.jsonl')
+os.environ['METRICS_DIR'] = os.path.join(SCRATCH_DIR, 'metrics')
+os.environ['SESSION_DIR'] = os.path.join(SCRATCH_DIR, 'sessions')
+os.environ['PROFILE_DIR'] = os.path.join(SCRATCH_DIR, 'profiles')
+
+# Seconds before a check that should return at once counts as hung
+HANG_TIMEOUT = 10.0
+
+CHECKS = []
+
+
+def check(func):
+    CHECKS.append(func)
+    return func
+
+
+def run_with_timeout(func, timeout=HANG_TIMEOUT):
+    """func() on a daemon thread; raises if it doesn't finish in time"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func()
+        except Exception as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise AssertionError(f"did not finish within {timeout:.0f} s (deadlock?)")
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
+@check
+def cold_app_without_warm_up():
+    """create_app({'WARM_UP': False}) in a fresh process, then one chat turn"""
+    import app as app_module
+
+    def create_and_post():
+        flask_app = app_module.create_app({'LOAD_DOTENV': False, 'WARM_UP': False})
+        return flask_app.test_client().post('/send_message', json={'message': 'someone is choking'})
+
+    response = run_with_timeout(create_and_post)
+    data = response.get_json()
+    assert response.status_code == 200 and data['status'] == 'success', data
+    assert data['emergency_type'] == 'choking', data['emergency_type']
+
+
+@check
+def small_talk_stays_casual():
+    """
+    Casual messages and small talk never get protocol steps from the search
+    fallback, while protocol questions still do
+    """
+    import app as app_module
+    from benchmarks.corpus import CASUAL_MESSAGES, SEARCH_QUERIES, SMALL_TALK_MESSAGES
+    flask_app = app_module.create_app({'LOAD_DOTENV': False})
+    with flask_app.app_context():
+        for message in CASUAL_MESSAGES + SMALL_TALK_MESSAGES:
+            trace = {}
+            response, emergency_type = app_module.get_ai_response(message, 'checks', [], trace)
+            assert trace['route'] != 'search', f"{message!r} -> search ({emergency_type})"
+        for message in SEARCH_QUERIES:
+            trace = {}
+            response, emergency_type = app_module.get_ai_response(message, 'checks', [], trace)
+            # Still answered from the protocols (keyword match or search), not the LLM
+            assert trace['route'] in ('protocol', 'search'), f"{message!r} -> {trace['route']}"
+            assert response, f"{message!r} -> empty {trace['route']} reply ({emergency_type})"
+
+
+@check
+def sessions_shared_between_workers():
+    """
+    A session started on one worker continues on another and on the realtime
+    server, under the id the page generated (separate apps stand in for processes)
+    """
+    import app as app_module
+    from realtime import RealtimeHub
+    first, second = (app_module.create_app({'LOAD_DOTENV': False}).test_client() for _ in range(2))
+    page_id = 'session_1760870700000_k3j9x2a1b'
+    data = first.post('/send_message', json={'message': 'someone is choking', 'session_id': page_id}).get_json()
+    assert data['session_id'] == page_id, data['session_id']
+    data = second.post('/send_message', json={'message': 'hello', 'session_id': page_id}).get_json()
+    assert data['session_id'] == page_id, data['session_id']
+
+    realtime_app = app_module.create_app({'LOAD_DOTENV': False})
+    hub = RealtimeHub(realtime_app, workers=1)
+    assert hub.bind(page_id) == page_id
+    hub.run_turn(page_id, 1, 'thank you')
+    history = realtime_app.extensions['neonexus'].sessions.load(page_id).history
+    assert [entry['message'] for entry in history if entry['sender'] == 'user'] == \
+        ['someone is choking', 'hello', 'thank you'], history
+    # Ids that aren't safe file names are replaced
+    assert hub.bind('../../etc/passwd') != '../../etc/passwd'
+
+    second.post('/reset_session', json={'session_id': page_id})
+    assert realtime_app.extensions['neonexus'].sessions.load(page_id).history == []
+
+
+@check
+def offline_catalog_covers_keywords():
+    """Every emergency type the offline keywords detect has steps, and the offline reply only suggests those"""
+    import json
+    import app as app_module
+    catalog = json.loads(app_module.get_offline_catalog())
+    for emergency_type, _ in catalog['keywords']:
+        if emergency_type != 'emergency':
+            assert catalog['protocols'].get(emergency_type, {}).get('text'), f"no offline steps for {emergency_type}"
+    suggested = catalog['replies']['offline']['text'].split('for example ', 1)[1].split(')', 1)[0]
+    for name in suggested.replace(' or ', ', ').split(', '):
+        assert name.replace(' ', '_') in catalog['protocols'], f"offline reply suggests {name!r}"
+
+
+@check
+def online_protocols_match_offline():
+    """Each keyword type's first keyword gets the same non-empty steps online as offline"""
+    import json
+    import app as app_module
+    client = app_module.create_app({'LOAD_DOTENV': False}).test_client()
+    catalog = json.loads(app_module.get_offline_catalog())
+    for emergency_type, keywords in catalog['keywords']:
+        if emergency_type == 'emergency':
+            continue
+        data = client.post('/send_message', json={'message': keywords[0]}).get_json()
+        assert data['response'], f"empty reply for {keywords[0]!r} ({data['emergency_type']})"
+        assert data['response'] == catalog['protocols'][data['emergency_type']]['text'], keywords[0]
+
+
+@check
+def admin_token_non_ascii():
+    """A non-ASCII admin token header is refused, not a server error"""
+    import app as app_module
+    client = app_module.create_app({'LOAD_DOTENV': False, 'ADMIN_TOKEN': 'secret-token'}).test_client()
+    for token in ('t\u00f6ken', 'secret-token\u00e9'):
+        response = client.get('/admin/memory', headers={'X-Admin-Token': token})
+        assert response.status_code == 403, response.status_code
+    assert client.get('/admin/memory', headers={'X-Admin-Token': 'secret-token'}).status_code == 200
+
+
+@check
+def request_threads_do_not_print():
+    """Lazy LLM creation and a finished profile log through event_log instead of printing"""
+    import contextlib
+    import io
+    import app as app_module
+    os.environ['FAKE_LLM_LATENCY_MS'] = '0'
+    flask_app = app_module.create_app({'LOAD_DOTENV': False, 'LLM_BACKEND': 'fake'})
+    flask_app.extensions['neonexus'].request_profiler.arm(requests=1)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        flask_app.test_client().post('/send_message', json={'message': 'what is your name'})
+    assert not output.getvalue(), output.getvalue()
+
+
+@check
+def chunked_body_limit():
+    """/ai_detection's body limit holds for chunked bodies, which declare no Content-Length"""
+    import io
+    import json
+    import app as app_module
+    client = app_module.create_app({'LOAD_DOTENV': False}).test_client()
+    limit = app_module.ENDPOINT_BODY_LIMITS['responder.ai_detection']
+    streamed = {'headers': {'Content-Type': 'application/json', 'Transfer-Encoding': 'chunked'},
+                'environ_overrides': {'wsgi.input_terminated': True}}
+    body = json.dumps({'emergency': 'fall', 'padding': 'x' * limit}).encode('utf-8')
+    response = client.post('/ai_detection', input_stream=io.BytesIO(body), **streamed)
+    assert response.status_code == 413, response.status_code
+    body = json.dumps({'emergency': 'fall'}).encode('utf-8')
+    response = client.post('/ai_detection', input_stream=io.BytesIO(body), **streamed)
+    assert response.get_json()['status'] == 'success', response.get_json()
+
+
+@check
+def infant_search_stays_infant():
+    """Search replies about an infant only use the infant choking steps, never the adult, child or pregnant ones"""
+    from search import REPLY_CANDIDATES, build_index, format_search_reply, select_reply_steps
+    index = build_index()
+    for query in ('infant back blows', 'how to do abdominal thrusts on an infant', 'back blows for a baby',
+                  'chest thrusts for an infant'):
+        results = index.search(query, REPLY_CANDIDATES)
+        protocol, variant, steps = select_reply_steps(results)
+        assert (protocol, variant) == ('choking', {'age_group': 'infant'}), f"{query!r} -> {protocol} {variant}"
+        assert all(step['variant'] == variant for step in steps), query
+        assert 'CHOKING (INFANT)' in format_search_reply(results)[0], query
+
+
+@check
+def realtime_streams_protocol_steps_only():
+    """The realtime channel streams steps for compiled protocols only, not before a search reply"""
+    import json
+    import app as app_module
+    from realtime import RealtimeHub
+    hub = RealtimeHub(app_module.create_app({'LOAD_DOTENV': False}), workers=1)
+    frames = hub.run_turn('realtime-check', 1, 'back blows for a baby')
+    assert [kind for kind, _ in frames] == ['reply'], [kind for kind, _ in frames]
+    assert 'CHOKING (INFANT)' in json.loads(frames[-1][1])['response']
+    frames = hub.run_turn('realtime-check', 2, 'someone is choking')
+    assert frames[0][0] == 'step' and frames[-1][0] == 'reply', [kind for kind, _ in frames]
+
+
+def main():
+    failures = 0
+    for func in CHECKS:
+        try:
+            func()
+            print(f"  ✅ {func.__name__}")
+        except Exception as e:
+            failures += 1
+            print(f"  ❌ {func.__name__}: {type(e).__name__}: {e}")
+    print(f"{len(CHECKS) - failures}/{len(CHECKS)} checks passed")
+    # Hung threads from a failed check must not keep the process alive
+    os._exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark Corpus
+Realistic chat messages used by the benchmarks and the load generator
+"""
+
+EMERGENCY_MESSAGES = [
+    "my father is choking on food please help",
+    "he cant breathe something stuck in his throat",
+    "my mom has severe chest pain and is sweating",
+    "I think he is having a heart attack",
+    "there is a lot of blood from a deep cut on his arm",
+    "she has a wound that won't stop bleeding",
+    "my friend passed out and is not responding",
+    "someone collapsed at the bus stop",
+    "a snake bit my brother on the leg",
+    "she touched a hot pan and got a bad burn",
+    "I think his leg is broken after he fell",
+    "kid fell off the bike and fractured his arm",
+    "a child is drowning in the pool",
+    "there was a car accident on the highway",
+    "two bikes had a collision near the market",
+    "emergency! someone is hurt",
+    "please call an ambulance",
+    "urgent help needed at the station",
+]
+
+CASUAL_MESSAGES = [
+    "hi",
+    "hello there",
+    "good morning",
+    "how are you",
+    "thanks for the help",
+    "what can you do",
+    "tell me about safety at home",
+    "what should I keep in a first aid kit",
+    "how do I prepare for emergencies",
+    "ok",
+]
+
+MISSPELLED_MESSAGES = [
+    "my dad is chokng",
+    "she is bleding a lot",
+    "he is unconsious on the floor",
+    "snak bite on my foot",
+    "my hand got burnd",
+    "i think its a fractre",
+    "car acident near my house",
+    "hart attack symptoms",
+]
+
+HINGLISH_MESSAGES = [
+    "mere papa ko saanp ne kaata",
+    "wo behosh ho gaye hain",
+    "bahut khoon beh raha hai",
+    "haath jal gaya garam tel se",
+    "sadak durghatna ho gayi hai",
+    "madad karo jaldi",
+]
+
+SEARCH_QUERIES = [
+    "what do I do about a tourniquet",
+    "how to use an epinephrine auto-injector",
+    "signs of heat stroke",
+    "recovery position steps",
+    "how long should a seizure last",
+    "infant back blows",
+    "hypothermia warming methods",
+    "signs of hypoglycemia",
+]
+
+# Small talk with words that also occur in protocol steps; must never get protocol
+# steps (behaviour checks only, not part of the benchmark mix)
+SMALL_TALK_MESSAGES = [
+    "tell me a joke",
+    "what time is it",
+    "I love ice cream",
+    "cold weather today",
+    "where is the hospital",
+    "he has a fever",
+    "how is your day going",
+    "my head is full of ideas",
+    "the water is nice today",
+    "keep me company",
+]
+
+# Weighted mix used for end-to-end and load tests
+MESSAGE_MIX = (
+    EMERGENCY_MESSAGES * 3 + CASUAL_MESSAGES * 2 + MISSPELLED_MESSAGES +
+    HINGLISH_MESSAGES + SEARCH_QUERIES
+)
+
+ALL_MESSAGES = EMERGENCY_MESSAGES + CASUAL_MESSAGES + MISSPELLED_MESSAGES + HINGLISH_MESSAGES + SEARCH_QUERIES
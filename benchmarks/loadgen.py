@@ -0,0 +1,189 @@
+"""
+Load Generator
+Replays a mix of emergency, casual, misspelled and Hinglish messages against a
+running server at a target request rate across many concurrent chat sessions
+
+Start the server with the local LLM stand-in so no API key or network is needed:
+    LLM_BACKEND=fake FAKE_LLM_LATENCY_MS=800 FAKE_LLM_ERROR_RATE=0.02 python app.py
+
+Then run:
+    python benchmarks/loadgen.py --url http://localhost:5000 --rate 50 --duration 60 --sessions 200
+
+Requests are scheduled open-loop (Poisson arrivals at --rate), so a slow server
+shows up as growing latency instead of a silently lower offered load.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.corpus import MESSAGE_MIX  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class LoadStats:
+    """Thread-safe collection of request outcomes"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.completed = 0
+        self._lock = threading.Lock()
+
+    def record(self, emergency_type, seconds):
+        with self._lock:
+            self.latencies.setdefault(emergency_type, []).append(seconds)
+            self.completed += 1
+
+    def record_error(self, kind):
+        with self._lock:
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+            self.completed += 1
+
+    def summary(self, elapsed):
+        all_latencies = sorted(value for values in self.latencies.values() for value in values)
+
+        def describe(values):
+            values = sorted(values)
+            return {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2)
+            }
+
+        return {
+            'elapsed_seconds': round(elapsed, 2),
+            'completed': self.completed,
+            'succeeded': len(all_latencies),
+            'throughput_rps': round(len(all_latencies) / elapsed, 2) if elapsed else 0,
+            'errors': dict(self.errors),
+            'overall': describe(all_latencies) if all_latencies else None,
+            'by_emergency_type': {kind: describe(values) for kind, values in sorted(self.latencies.items())}
+        }
+
+
+class Session:
+    """One simulated user with their own chat session"""
+
+    def __init__(self):
+        self.session_id = None
+        self.lock = threading.Lock()
+
+
+def send(http, url, session, message, stats, timeout):
+    start = time.perf_counter()
+    try:
+        response = http.post(f"{url}/send_message",
+                             json={'message': message, 'session_id': session.session_id},
+                             timeout=timeout)
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            stats.record_error(f"http_{response.status_code}")
+            return
+        data = response.json()
+        if data.get('status') != 'success':
+            stats.record_error('app_error')
+            return
+        session.session_id = data.get('session_id')
+        stats.record(data.get('emergency_type') or 'casual', elapsed)
+    except requests.Timeout:
+        stats.record_error('timeout')
+    except requests.RequestException:
+        stats.record_error('connection')
+    except ValueError:
+        stats.record_error('bad_json')
+
+
+def run(url, rate, duration, sessions, workers, timeout, seed):
+    rng = random.Random(seed)
+    stats = LoadStats()
+    users = [Session() for _ in range(sessions)]
+    local = threading.local()
+
+    def http_session():
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+        return local.http
+
+    def task(user, message):
+        send(http_session(), url, user, message, stats, timeout)
+
+    start = time.perf_counter()
+    next_at = start
+    issued = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            now = time.perf_counter()
+            if now - start >= duration:
+                break
+            if now < next_at:
+                time.sleep(min(next_at - now, 0.05))
+                continue
+            pool.submit(task, rng.choice(users), rng.choice(MESSAGE_MIX))
+            issued += 1
+            next_at += rng.expovariate(rate)
+    elapsed = time.perf_counter() - start
+
+    result = stats.summary(elapsed)
+    result['offered_rps'] = round(issued / duration, 2)
+    result['config'] = {'url': url, 'rate': rate, 'duration': duration, 'sessions': sessions,
+                        'workers': workers, 'timeout': timeout, 'seed': seed}
+    return result
+
+
+def print_report(result):
+    print(f"\nOffered {result['offered_rps']} req/s, achieved {result['throughput_rps']} req/s "
+          f"over {result['elapsed_seconds']} s")
+    print(f"Completed {result['completed']}, succeeded {result['succeeded']}, errors {result['errors'] or 0}")
+    print(f"\n{'emergency type':18s} {'count':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    rows = list(result['by_emergency_type'].items())
+    if result['overall']:
+        rows.append(('ALL', result['overall']))
+    for kind, row in rows:
+        print(f"{kind:18s} {row['count']:7d} {row['p50_ms']:9.2f} {row['p95_ms']:9.2f} "
+              f"{row['p99_ms']:9.2f} {row['max_ms']:9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus chat load generator')
+    parser.add_argument('--url', default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--rate', type=float, default=20.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Test length in seconds')
+    parser.add_argument('--sessions', type=int, default=100, help='Concurrent chat sessions')
+    parser.add_argument('--workers', type=int, default=64, help='Maximum in-flight requests')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1234, help='Seed for message and session choice')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    print(f"🚑 Load test: {args.rate} req/s for {args.duration} s across {args.sessions} sessions -> {args.url}")
+    result = run(args.url, args.rate, args.duration, args.sessions, args.workers, args.timeout, args.seed)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    return 1 if result['errors'] and not result['succeeded'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Page Load
+First-load bytes and modelled time-to-interactive of the index page, with
+and without INLINE_ASSETS, plus the server cost of serving the page
+
+Usage:
+    python benchmarks/pageload.py
+    python benchmarks/pageload.py --rtt-ms 300 --kbps 1600 --parse-mb-s 0.5
+
+The page is fetched through the Flask test client and its HTML is parsed for
+the resources that hold up the chat: stylesheets in <head>, classic and
+deferred scripts (the chat initializes on DOMContentLoaded, which waits for
+both). Byte counts are exact; time-to-interactive is a model of a cold load
+without a service worker:
+
+    connect (1 RTT) + HTML (1 RTT + transfer)
+    + blocking resources fetched in parallel (1 RTT + transfer of all of them,
+      3 more RTTs for a new origin)
+    + JavaScript parse and execution at --parse-mb-s
+
+There is no browser in the benchmark environment, so the model stands in for
+a Lighthouse run; use it to compare builds, not as an absolute figure.
+"""
+
+import argparse
+import os
+import sys
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# Icon stylesheet from the CDN: its size can't be fetched offline, so it is assumed
+EXTERNAL_STYLESHEET_BYTES = 100 * 1024
+
+
+class PageResources(HTMLParser):
+    """Stylesheets and scripts of a page, in document order"""
+
+    def __init__(self):
+        super().__init__()
+        self.resources = []
+        self.inline_script_bytes = 0
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'link' and attrs.get('rel') == 'stylesheet':
+            self.resources.append(('stylesheet', attrs['href'], True))
+        elif tag == 'link' and attrs.get('rel') == 'preload':
+            self.resources.append(('preload', attrs['href'], False))
+        elif tag == 'script' and attrs.get('src'):
+            self.resources.append(('script', attrs['src'], 'async' not in attrs))
+        elif tag == 'script':
+            self._in_script = True
+
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._in_script:
+            self.inline_script_bytes += len(data.encode('utf-8'))
+
+
+def analyse_page(client, args):
+    html = client.get('/').data
+    parser = PageResources()
+    # <noscript> fallbacks only apply without JavaScript
+    parser.feed(html.decode('utf-8').replace('<noscript>', '<!--').replace('</noscript>', '-->'))
+
+    blocking_bytes = 0
+    blocking_script_bytes = 0
+    blocking_requests = 0
+    new_origin = False
+    deferred_bytes = 0
+    for kind, url, blocking in parser.resources:
+        if urlparse(url).netloc:
+            size = EXTERNAL_STYLESHEET_BYTES
+            external = True
+        else:
+            size = len(client.get(url).data)
+            external = False
+        if not blocking:
+            deferred_bytes += size
+            continue
+        blocking_requests += 1
+        blocking_bytes += size
+        new_origin = new_origin or external
+        if kind == 'script':
+            blocking_script_bytes += size
+
+    rtt = args.rtt_ms / 1000
+    bytes_per_second = args.kbps * 1000 / 8
+    seconds = 2 * rtt + len(html) / bytes_per_second
+    if blocking_requests:
+        seconds += rtt + blocking_bytes / bytes_per_second + (3 * rtt if new_origin else 0)
+    script_bytes = blocking_script_bytes + parser.inline_script_bytes
+    seconds += script_bytes / (args.parse_mb_s * 1024 * 1024)
+    return {
+        'html_bytes': len(html),
+        'requests': 1 + blocking_requests,
+        'first_load_bytes': len(html) + blocking_bytes,
+        'script_bytes': script_bytes,
+        'non_blocking_bytes': deferred_bytes,
+        'tti_ms': seconds * 1000
+    }
+
+
+def serve_cost(client, number):
+    """Mean time for GET / and for a revalidation that returns 304"""
+    etag = client.get('/').headers['ETag']
+    start = time.perf_counter()
+    for _ in range(number):
+        client.get('/')
+    full = (time.perf_counter() - start) / number
+    start = time.perf_counter()
+    for _ in range(number):
+        response = client.get('/', headers={'If-None-Match': etag})
+    revalidate = (time.perf_counter() - start) / number
+    return full, revalidate, response.status_code, len(response.data)
+
+
+def render_cost(app_module, flask_app, number):
+    """Mean time of rendering the page (what the route did per request) and of the cached lookup"""
+    start = time.perf_counter()
+    for _ in range(number):
+        app_module.render_index(flask_app)
+    render = (time.perf_counter() - start) / number
+    start = time.perf_counter()
+    for _ in range(number):
+        app_module.get_index_page(flask_app)
+    return render, (time.perf_counter() - start) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus index page load model')
+    parser.add_argument('--rtt-ms', type=float, default=150.0, help='Round-trip time')
+    parser.add_argument('--kbps', type=float, default=1600.0, help='Downlink bandwidth in kilobits/s')
+    parser.add_argument('--parse-mb-s', type=float, default=1.0, help='JavaScript parse/execute rate, MB/s')
+    parser.add_argument('--number', type=int, default=2000, help='Requests per server timing')
+    args = parser.parse_args()
+
+    import app as app_module
+
+    print(f"Network model: {args.rtt_ms:.0f} ms RTT, {args.kbps:.0f} kbit/s, JS at {args.parse_mb_s} MB/s\n")
+    print(f"{'build':10s} {'html':>9s} {'requests':>9s} {'first load':>11s} {'blocking JS':>12s} "
+          f"{'non-blocking':>12s} {'TTI model':>10s}")
+    results = {}
+    apps = {}
+    for name, inline in (('default', False), ('inline', True)):
+        flask_app = apps[name] = app_module.create_app({'LOAD_DOTENV': False, 'GEMINI_API_KEY': '', 'PRELOAD': True,
+                                                       'INLINE_ASSETS': inline})
+        client = flask_app.test_client()
+        result = results[name] = analyse_page(client, args)
+        print(f"{name:10s} {result['html_bytes']:9,d} {result['requests']:9d} {result['first_load_bytes']:11,d} "
+              f"{result['script_bytes']:12,d} {result['non_blocking_bytes']:12,d} {result['tti_ms']:8.0f} ms")
+        result['serve'] = serve_cost(client, args.number)
+    before, after = results['default'], results['inline']
+    print(f"\nFirst-load bytes {before['first_load_bytes'] / after['first_load_bytes']:.1f}x smaller, "
+          f"modelled TTI {before['tti_ms'] - after['tti_ms']:,.0f} ms sooner")
+
+    camera_bytes = sum(os.path.getsize(os.path.join(ROOT_DIR, 'static', 'js', name))
+                       for name in ('face-api.min.js', 'camera.js'))
+    print(f"Inline build loads face-api and the camera code ({camera_bytes:,d} bytes) when the camera is turned on")
+
+    full, revalidate, status, body = results['default']['serve']
+    render, cached = render_cost(app_module, apps['default'], args.number)
+    print(f"\nRender per request (previous route): {render * 1e6:.0f} us, cached page: {cached * 1e6:.2f} us")
+    print(f"GET / through the test client: {full * 1e6:.0f} us, revalidation: {revalidate * 1e6:.0f} us "
+          f"-> {status} with {body} body bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
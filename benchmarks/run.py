@@ -0,0 +1,310 @@
+"""
+Benchmark Suite
+Offline benchmarks for emergency classification, protocol lookup, reply
+serialization and the chat routes (through the Flask test client)
+
+Usage:
+    python benchmarks/run.py                     # run and compare against baseline.json
+    python benchmarks/run.py --only classify     # run benchmarks whose name contains 'classify'
+    python benchmarks/run.py --update-baseline   # store this run as the new baseline
+
+Behaviour checks (benchmarks/checks.py) run first, in their own process;
+a failing check stops the run with status 1.
+
+Results are written to benchmarks/results/. The run exits with status 1
+when any benchmark's p50 is slower than the baseline by more than --tolerance.
+Each benchmark is repeated (--repeat) and the repeat with the lowest p50 is kept,
+which filters out interference from other processes on the machine.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# Never reach the network: run with emergency protocols only
+os.environ['GEMINI_API_KEY'] = ''
+# The routes log, record transcripts, share metrics and store sessions: keep all of it out of the repository
+SCRATCH_DIR = tempfile.mkdtemp(prefix='neonexus-bench-')
+os.environ['TRANSCRIPT_DIR'] = os.path.join(SCRATCH_DIR, 'transcripts')
+os.environ['LOG_FILE'] = os.path.join(SCRATCH_DIR, 'logs', 'events.jsonl')
+os.environ['METRICS_DIR'] = os.path.join(SCRATCH_DIR, 'metrics')
+os.environ['SESSION_DIR'] = os.path.join(SCRATCH_DIR, 'sessions')
+
+from benchmarks.corpus import ALL_MESSAGES, MESSAGE_MIX, SEARCH_QUERIES  # noqa: E402
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_REPEAT = 3
+WARMUP_ITERATIONS = 200
+
+# Pure-Python reference workload used to normalize for machine speed
+CALIBRATION_NAME = 'calibration.python_loop'
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def measure(func, inputs, iterations, batch=1):
+    """
+    Time func over inputs (cycled)
+    Sub-microsecond operations are timed in batches so timer overhead
+    doesn't dominate; each sample is the per-call average of one batch
+    """
+    for i in range(min(WARMUP_ITERATIONS, iterations)):
+        func(inputs[i % len(inputs)])
+
+    samples = []
+    perf_counter_ns = time.perf_counter_ns
+    rounds = max(iterations // batch, 1)
+    gc.collect()
+    gc.disable()
+    try:
+        for i in range(rounds):
+            values = [inputs[(i * batch + j) % len(inputs)] for j in range(batch)]
+            start = perf_counter_ns()
+            for value in values:
+                func(value)
+            samples.append((perf_counter_ns() - start) / batch)
+    finally:
+        gc.enable()
+
+    samples.sort()
+    total_seconds = sum(samples) * batch / 1e9
+    iterations = rounds * batch
+    return {
+        'iterations': iterations,
+        'min_us': round(samples[0] / 1000, 3),
+        'p50_us': round(percentile(samples, 0.50) / 1000, 3),
+        'p95_us': round(percentile(samples, 0.95) / 1000, 3),
+        'p99_us': round(percentile(samples, 0.99) / 1000, 3),
+        'mean_us': round(sum(samples) / len(samples) / 1000, 3),
+        'ops_per_sec': round(iterations / total_seconds, 1) if total_seconds else None
+    }
+
+
+def calibration_workload(n):
+    total = 0
+    for i in range(n):
+        total += i % 7
+    return total
+
+
+def build_benchmarks():
+    """Return (name, func, inputs, iterations, batch) tuples"""
+    import app as app_module
+    from context import ConversationContext, build_prompt
+    from eventlog import EventLogger
+    from metrics import Counter, Histogram
+    from protocols import PROTOCOL_MAP, get_protocol
+    from search import PROTOCOL_VARIANTS
+    from timeseries import RollingCounts
+    from transcript import TranscriptLog
+
+    random.seed(1234)
+    flask_app = app_module.create_app({'LOAD_DOTENV': False, 'GEMINI_API_KEY': ''})
+    snapshot = app_module.get_catalog_store().current()
+    client = flask_app.test_client()
+
+    protocol_calls = [(name, variant) for name in PROTOCOL_MAP
+                      for variant in PROTOCOL_VARIANTS.get(name, [{}])]
+    emergency_types = list(snapshot['protocol_text'].keys()) + list(snapshot['images'].keys())
+
+    reply = {
+        'status': 'success',
+        'response': snapshot['protocol_text']['choking'],
+        'response_html': snapshot['protocol_html']['choking'],
+        'session_id': '6f1c1b7e-2d5b-4c43-9d2a-6a2f2a3c9a10',
+        'emergency_type': 'choking'
+    }
+
+    from fastjson import encode
+
+    reply_prefix = snapshot['protocol_reply_prefix']['choking']
+
+    def prebuilt_reply(session_id):
+        return reply_prefix + b'"session_id":' + encode(session_id) + b',"status":"success"}'
+
+    session = {'id': None}
+
+    def send_message(message):
+        response = client.post('/send_message', json={'message': message, 'session_id': session['id']})
+        session['id'] = response.get_json()['session_id']
+
+    counter = Counter('bench_total', 'Benchmark counter', ['type'])
+    histogram = Histogram('bench_seconds', 'Benchmark histogram', ['stage'])
+    rates = RollingCounts(dict.fromkeys(emergency_types))
+
+    def timed_block(stage):
+        with histogram.time(stage):
+            pass
+
+    # A long conversation: prompt building should cost the same as for a short one
+    long_context = ConversationContext()
+    for turn in range(500):
+        long_context.add_turn(MESSAGE_MIX[turn % len(MESSAGE_MIX)], snapshot['protocol_text']['choking'][:300], 'casual')
+
+    def context_build(message):
+        long_context._rendered = None
+        return build_prompt(long_context, message)
+
+    bench_log = EventLogger(path=os.path.join(SCRATCH_DIR, 'bench-events.jsonl'), queue_size=200000)
+    bench_log.start()
+    bench_transcript = TranscriptLog(directory=os.path.join(SCRATCH_DIR, 'bench-transcripts'), fsync=False, queue_size=200000)
+    bench_transcript.start()
+
+    return [
+        (CALIBRATION_NAME, calibration_workload, [1000], 2000, 1),
+        ('classify.detect_emergency_type', app_module.detect_emergency_type, ALL_MESSAGES, 20000, 1),
+        ('search.protocol_index', app_module.get_search_index().search, SEARCH_QUERIES, 20000, 1),
+        ('protocols.get_protocol', lambda call: get_protocol(call[0], **call[1]), protocol_calls, 50000, 50),
+        ('catalog.protocol_text', lambda name: snapshot['protocol_text'].get(name), emergency_types, 50000, 50),
+        ('json.send_message_reply', json.dumps, [reply], 20000, 1),
+        ('json.flask_provider_reply', flask_app.json.dumps, [reply], 20000, 1),
+        ('json.prebuilt_protocol_reply', prebuilt_reply, [reply['session_id']], 50000, 50),
+        ('metrics.counter_inc', counter.inc, ['cardiac'], 100000, 50),
+        ('metrics.histogram_observe', lambda stage: histogram.observe(0.0003, stage), ['classify'], 100000, 50),
+        ('metrics.stage_timer', timed_block, ['classify'], 100000, 50),
+        ('timeseries.inc', rates.inc, emergency_types, 100000, 50),
+        ('timeseries.windows_60s', lambda count: rates.windows('second', count), [60], 2000, 1),
+        ('context.build_prompt_500_turns', context_build, ALL_MESSAGES, 20000, 1),
+        ('eventlog.log', lambda payload: bench_log.info('ai_detection', 'detection', payload=payload),
+         [{'emotion': 'fear', 'confidence': 0.91}], 100000, 50),
+        ('transcript.record', lambda message: bench_transcript.record(
+            'turn', session_id='bench', channel='http', message=message, emergency_type='choking',
+            route='protocol', response=None), ALL_MESSAGES, 100000, 50),
+        ('route.send_message', send_message, MESSAGE_MIX, 3000, 1),
+        ('route.get_emergency_images', lambda kind: client.get(f'/get_emergency_images/{kind}'),
+         emergency_types, 3000, 1),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print a comparison against the baseline and return the regressed benchmark names
+    Ratios are divided by the calibration ratio (best sample, never below 1)
+    so a slower or busier machine alone is not reported as a regression
+    """
+    base_results = baseline.get('results', {})
+    speed = 1.0
+    if CALIBRATION_NAME in results and CALIBRATION_NAME in base_results:
+        speed = max(results[CALIBRATION_NAME]['min_us'] / base_results[CALIBRATION_NAME]['min_us'], 1.0)
+        print(f"  Machine speed factor: {speed:.2f}x baseline")
+
+    regressions = []
+    for name, result in results.items():
+        base = base_results.get(name)
+        if name == CALIBRATION_NAME:
+            continue
+        if not base:
+            print(f"  {name:34s} (no baseline)")
+            continue
+        ratio = result['p50_us'] / base['p50_us'] / speed if base['p50_us'] else 1.0
+        marker = '❌' if ratio > 1 + tolerance else '✅'
+        print(f"  {marker} {name:32s} p50 {base['p50_us']:>9.2f} -> {result['p50_us']:>9.2f} us ({ratio:5.2f}x)")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus benchmark suite')
+    parser.add_argument('--only', help='Run benchmarks whose name contains this text')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply iteration counts')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help='Repeats per benchmark; the fastest p50 is kept')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed p50 slowdown versus baseline (0.5 = 50%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='Save this run as the baseline')
+    parser.add_argument('--skip-checks', action='store_true', help="Don't run benchmarks/checks.py first")
+    args = parser.parse_args()
+
+    if not args.skip_checks:
+        print("Behaviour checks:")
+        if subprocess.run([sys.executable, os.path.join(BENCH_DIR, 'checks.py')]).returncode != 0:
+            print("\n❌ Behaviour checks failed, not benchmarking")
+            return 1
+        print()
+
+    results = {}
+    print(f"{'benchmark':36s} {'p50 us':>9s} {'p95 us':>9s} {'p99 us':>9s} {'ops/sec':>12s}")
+    for name, func, inputs, iterations, batch in build_benchmarks():
+        if args.only and args.only not in name:
+            continue
+        iterations = max(int(iterations * args.scale), batch)
+        result = min((measure(func, inputs, iterations, batch) for _ in range(max(args.repeat, 1))),
+                     key=lambda run_result: run_result['p50_us'])
+        results[name] = result
+        print(f"{name:36s} {result['p50_us']:9.2f} {result['p95_us']:9.2f} {result['p99_us']:9.2f} "
+              f"{result['ops_per_sec']:12.1f}")
+
+    run = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scale': args.scale,
+            'repeat': args.repeat
+        },
+        'results': results
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, datetime.now().strftime('bench-%Y%m%d-%H%M%S.json'))
+    with open(results_path, 'w') as f:
+        json.dump(run, f, indent=2)
+    print(f"\nResults written to {results_path}")
+
+    if args.update_baseline:
+        baseline = {'meta': run['meta'], 'results': results}
+        if os.path.exists(BASELINE_PATH) and args.only:
+            with open(BASELINE_PATH) as f:
+                baseline['results'] = {**json.load(f)['results'], **results}
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(baseline, f, indent=2)
+            f.write('\n')
+        print(f"Baseline updated: {BASELINE_PATH}")
+        return 0
+
+    if not os.path.exists(BASELINE_PATH):
+        print("No baseline found. Run with --update-baseline to create one.")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with baseline from {baseline['meta'].get('git_revision')} "
+          f"(tolerance {args.tolerance:.0%}):")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n❌ REGRESSION in {len(regressions)} benchmark(s): {', '.join(regressions)}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
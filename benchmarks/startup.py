@@ -0,0 +1,98 @@
+"""
+Startup Benchmark
+Cold-start time of a fresh interpreter: importing app, create_app(), the first
+emergency request, and (separately) the deferred LLM client creation
+
+Usage:
+    python benchmarks/startup.py                 # 5 runs each, without and with an API key
+    python benchmarks/startup.py --runs 10
+
+The "with key" case uses a dummy key, so the Gemini client is configured but
+never called; no network access is needed.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+
+DUMMY_API_KEY = 'startup-benchmark-dummy-key'
+
+# The first request is logged, transcribed and stored as a session: not in the repository
+SCRATCH_DIR = tempfile.mkdtemp(prefix='neonexus-startup-')
+
+# Runs in a child interpreter so every measurement is a cold start
+CHILD_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+flask_app = app_module.create_app({'LOAD_DOTENV': False, 'GEMINI_API_KEY': sys.argv[1]})
+created = time.perf_counter()
+response = flask_app.test_client().post('/send_message', json={'message': 'someone is choking'})
+assert response.status_code == 200, response.status_code
+first_request = time.perf_counter()
+llm_loaded = 'google.generativeai' in sys.modules
+with flask_app.app_context():
+    app_module.get_state().get_model()
+model_ready = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'ready_ms': (first_request - start) * 1000,
+    'llm_imported_before_first_use': llm_loaded,
+    'llm_init_ms': (model_ready - first_request) * 1000
+}))
+'''
+
+
+def run_once(api_key):
+    env = dict(os.environ, LLM_BACKEND='gemini', GEMINI_API_KEY=api_key, LLM_WARMUP='',
+               TRANSCRIPT_DIR=os.path.join(SCRATCH_DIR, 'transcripts'),
+               LOG_FILE=os.path.join(SCRATCH_DIR, 'logs', 'events.jsonl'),
+               METRICS_DIR=os.path.join(SCRATCH_DIR, 'metrics'),
+               SESSION_DIR=os.path.join(SCRATCH_DIR, 'sessions'))
+    output = subprocess.check_output([sys.executable, '-c', CHILD_SCRIPT, api_key],
+                                     cwd=ROOT_DIR, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def measure(api_key, runs):
+    samples = [run_once(api_key) for _ in range(runs)]
+    summary = {key: round(median([sample[key] for sample in samples]), 1)
+               for key in samples[0] if key.endswith('_ms')}
+    summary['llm_imported_before_first_use'] = any(sample['llm_imported_before_first_use'] for sample in samples)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus cold-start benchmark')
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts per case (median is reported)')
+    args = parser.parse_args()
+
+    results = {
+        'without_key': measure('', args.runs),
+        'with_key': measure(DUMMY_API_KEY, args.runs)
+    }
+    print(f"{'case':12s} {'import':>9s} {'create':>9s} {'1st req':>9s} {'ready':>9s} {'llm init':>9s}  (ms, median)")
+    for case, row in results.items():
+        print(f"{case:12s} {row['import_ms']:9.1f} {row['create_app_ms']:9.1f} {row['first_request_ms']:9.1f} "
+              f"{row['ready_ms']:9.1f} {row['llm_init_ms']:9.1f}")
+        if row['llm_imported_before_first_use']:
+            print(f"  ⚠️  {case}: LLM client was imported before first use")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+WebSocket Load
+Holds many idle chat connections open against realtime.py and measures
+chat round trips on an extra connection while they are connected
+
+Start the server, then run:
+    python realtime.py --port 5001
+    python benchmarks/wsload.py --url ws://localhost:5001/ws --idle 5000 --server-pid <pid>
+
+With --server-pid the server's resident memory is sampled before and after
+connecting, giving the memory cost of one idle connection.
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+
+from websockets.asyncio.client import connect
+
+
+def rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+
+def percentile(sorted_values, fraction):
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def open_idle(url, count, batch):
+    connections = []
+    for start in range(0, count, batch):
+        connections.extend(await asyncio.gather(*(connect(url, compression=None)
+                                                  for _ in range(min(batch, count - start)))))
+    # Wait for every session frame so the server has finished binding them
+    await asyncio.gather(*(connection.recv() for connection in connections))
+    return connections
+
+
+async def chat_round_trips(url, messages, turns):
+    latencies = []
+    async with connect(url, compression=None) as websocket:
+        await websocket.recv()
+        for turn in range(turns):
+            start = time.perf_counter()
+            await websocket.send(json.dumps({'type': 'message', 'id': turn, 'message': messages[turn % len(messages)]}))
+            while json.loads(await websocket.recv())['type'] != 'reply':
+                pass
+            latencies.append(time.perf_counter() - start)
+    return sorted(latencies)
+
+
+async def run(args):
+    messages = ['someone is choking', 'my friend collapsed and is not breathing', 'hello', 'severe burn on arm']
+    before = rss_kb(args.server_pid) if args.server_pid else None
+
+    start = time.perf_counter()
+    connections = await open_idle(args.url, args.idle, args.batch)
+    connect_seconds = time.perf_counter() - start
+    await asyncio.sleep(1.0)
+    after = rss_kb(args.server_pid) if args.server_pid else None
+
+    latencies = await chat_round_trips(args.url, messages, args.turns)
+    alive = sum(1 for connection in connections if connection.state.name == 'OPEN')
+    await asyncio.gather(*(connection.close() for connection in connections))
+
+    print(f"🔌 {args.idle} idle connections opened in {connect_seconds:.2f} s, {alive} still open after the chat turns")
+    if before is not None and after is not None:
+        print(f"   server RSS {before / 1024:.1f} MB -> {after / 1024:.1f} MB "
+              f"({(after - before) / max(args.idle, 1):.1f} KB per idle connection)")
+    print(f"💬 {args.turns} chat turns with them connected: p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.2f} ms")
+    return 0 if alive == args.idle else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus WebSocket idle-connection load test')
+    parser.add_argument('--url', default='ws://localhost:5001/ws', help='WebSocket URL')
+    parser.add_argument('--idle', type=int, default=2000, help='Idle connections to hold open')
+    parser.add_argument('--batch', type=int, default=200, help='Connections opened concurrently')
+    parser.add_argument('--turns', type=int, default=200, help='Chat turns measured while connected')
+    parser.add_argument('--server-pid', type=int, help='Server process id, to sample its memory')
+    args = parser.parse_args()
+
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if args.idle + 64 > hard:
+        print(f"❌ Open-file limit {hard} is too low for {args.idle} connections")
+        return 1
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,240 @@
+"""
+Emergency Catalog
+Compiles the keyword, protocol and image data files into a single snapshot
+that workers load at startup and hot-reload when it changes
+
+Every keyword type gets protocol text: types without a data pack protocol
+use the BCLS steps from protocols.py (the primary assessment for types that
+have none, such as road accidents). The server, the realtime escalation and
+the service worker's offline catalog all read the same table.
+"""
+
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+
+from eventlog import event_log
+from fastjson import encode
+from protocols import PROTOCOL_MAP, get_protocol
+from render import render_html
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'catalog.snapshot')
+
+# Bump when the snapshot layout or compiled content changes so old snapshots are rebuilt
+SNAPSHOT_FORMAT = 4
+
+# BCLS protocol for keyword types with no protocol of their own
+FALLBACK_PROTOCOL = 'universal'
+
+# Seconds between snapshot mtime checks on the request path
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def source_files(data_dir=DATA_DIR):
+    """Data files that make up the catalog, plus protocols.py for the BCLS fallback steps"""
+    return [os.path.join(data_dir, 'protocols.json'), os.path.join(data_dir, 'images.json'),
+            os.path.join(BASE_DIR, 'protocols.py')] + \
+        sorted(glob.glob(os.path.join(data_dir, 'keywords', '*.json')))
+
+
+def bcls_reply(emergency_type, steps):
+    """BCLS protocol steps (protocols.py) as a chat reply in the data pack's format"""
+    lines = [f"🚨 **{emergency_type.replace('_', ' ').upper()} EMERGENCY** 🚨",
+             "**📞 CALL 108/112 IMMEDIATELY**"]
+    number = 0
+    for step in steps:
+        if step.startswith(' '):
+            lines.append(f"   {step.strip()}")
+            continue
+        number += 1
+        title, _, detail = step.partition(':')
+        lines.append(f"**STEP {number}: {title.strip()}:** {detail.strip()}".rstrip())
+    return "\n".join(lines)
+
+
+def compile_catalog(data_dir=DATA_DIR):
+    """
+    Compile data files into a snapshot dictionary
+    Keyword packs are merged in file order: 'en' first, then the rest alphabetically
+    """
+    protocols_data = _read_json(os.path.join(data_dir, 'protocols.json'))
+    images_data = _read_json(os.path.join(data_dir, 'images.json'))
+
+    pack_paths = sorted(glob.glob(os.path.join(data_dir, 'keywords', '*.json')),
+                        key=lambda path: (os.path.basename(path) != 'en.json', path))
+    packs = [_read_json(path) for path in pack_paths]
+
+    # Matcher table: ordered (emergency_type, keywords) pairs, first match wins
+    merged = {}
+    for pack in packs:
+        for emergency_type, keywords in pack['keywords'].items():
+            bucket = merged.setdefault(emergency_type, [])
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword not in bucket:
+                    bucket.append(keyword)
+    keywords = tuple((emergency_type, tuple(words)) for emergency_type, words in merged.items())
+
+    protocols = protocols_data['protocols']
+    protocol_text = {name: "\n".join(steps) for name, steps in protocols.items()}
+    for name, _ in keywords:
+        if name != 'emergency' and name not in protocol_text:
+            protocol_text[name] = bcls_reply(name, get_protocol(name if name in PROTOCOL_MAP else FALLBACK_PROTOCOL))
+    protocol_html = {name: render_html(text) for name, text in protocol_text.items()}
+    images = images_data['images']
+    versions = [f"protocols@{protocols_data['version']}", f"images@{images_data['version']}"]
+    versions += [f"keywords-{pack['pack']}@{pack['version']}" for pack in packs]
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': '+'.join(versions),
+        'built_at': datetime.now().isoformat(),
+        'keywords': keywords,
+        'protocols': {name: tuple(steps) for name, steps in protocols.items()},
+        'protocol_text': protocol_text,
+        'protocol_html': protocol_html,
+        'protocol_reply_prefix': {name: protocol_reply_prefix(name, protocol_text[name], protocol_html[name])
+                                  for name in protocol_text},
+        'images': images,
+        'images_json': {name: encode({'status': 'success', 'emergency_type': name, 'images': entries})
+                        for name, entries in images.items()}
+    }
+
+
+def protocol_reply_prefix(name, text, html):
+    """
+    Pre-encoded start of a send_message reply for a protocol
+    Keys are in sorted order; the caller appends session_id and status
+    """
+    return (b'{"emergency_type":' + encode(name) + b',"response":' + encode(text) +
+            b',"response_html":' + encode(html) + b',')
+
+
+def write_snapshot(snapshot, path=SNAPSHOT_PATH):
+    """Write a snapshot atomically so readers never see a partial file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """Load a snapshot file, returning (snapshot, load_seconds, size_bytes)"""
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        data = f.read()
+    snapshot = pickle.loads(data)
+    if snapshot.get('format') != SNAPSHOT_FORMAT:
+        raise ValueError(f"Unsupported snapshot format {snapshot.get('format')}")
+    return snapshot, time.perf_counter() - start, len(data)
+
+
+def snapshot_is_stale(path=SNAPSHOT_PATH, data_dir=DATA_DIR):
+    """True if the snapshot is missing or older than any data file"""
+    if not os.path.exists(path):
+        return True
+    snapshot_mtime = os.path.getmtime(path)
+    return any(os.path.getmtime(source) > snapshot_mtime for source in source_files(data_dir))
+
+
+def build_snapshot(path=SNAPSHOT_PATH, data_dir=DATA_DIR):
+    """Compile the data files and write the snapshot, returning its size"""
+    return write_snapshot(compile_catalog(data_dir), path)
+
+
+class CatalogStore:
+    """
+    Holds the current catalog snapshot
+    Readers take a reference through current(); a reload swaps the reference
+    so in-flight requests keep using the snapshot they started with
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, data_dir=DATA_DIR):
+        self.path = path
+        self.data_dir = data_dir
+        self.snapshot = None
+        self.mtime = None
+        self.load_seconds = None
+        self.size_bytes = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Load the snapshot, compiling it first if missing or stale"""
+        if snapshot_is_stale(self.path, self.data_dir):
+            build_snapshot(self.path, self.data_dir)
+        try:
+            snapshot, load_seconds, size_bytes = load_snapshot(self.path)
+        except (ValueError, EOFError, pickle.UnpicklingError):
+            # Snapshot from an older layout or truncated: rebuild it
+            build_snapshot(self.path, self.data_dir)
+            snapshot, load_seconds, size_bytes = load_snapshot(self.path)
+        self.mtime = os.path.getmtime(self.path)
+        self.load_seconds = load_seconds
+        self.size_bytes = size_bytes
+        self.snapshot = snapshot
+        event_log.info('catalog', 'loaded', version=snapshot['version'],
+                       load_ms=round(load_seconds * 1000, 3), bytes=size_bytes)
+
+    def current(self):
+        """Return the current snapshot, reloading if the file changed"""
+        now = time.monotonic()
+        if now >= self._next_check:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            self._reload_if_changed()
+        return self.snapshot
+
+    def _reload_if_changed(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self.mtime or not self._lock.acquire(blocking=False):
+            return
+        try:
+            snapshot, load_seconds, size_bytes = load_snapshot(self.path)
+            self.mtime = mtime
+            self.load_seconds = load_seconds
+            self.size_bytes = size_bytes
+            self.snapshot = snapshot
+            event_log.info('catalog', 'reloaded', version=snapshot['version'],
+                           load_ms=round(load_seconds * 1000, 3), bytes=size_bytes)
+        except Exception as e:
+            event_log.error('catalog', 'reload_failed', version=self.snapshot['version'], error=str(e),
+                            error_type=type(e).__name__)
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        """Version, load time and size of the current snapshot"""
+        snapshot = self.current()
+        return {
+            'version': snapshot['version'],
+            'built_at': snapshot['built_at'],
+            'load_ms': round(self.load_seconds * 1000, 3),
+            'size_bytes': self.size_bytes
+        }
+
+
+if __name__ == "__main__":
+    # Compile the data files into a snapshot for workers to pick up
+    start = time.perf_counter()
+    size = build_snapshot()
+    compile_ms = (time.perf_counter() - start) * 1000
+    snapshot, load_seconds, _ = load_snapshot()
+    print(f"Compiled {snapshot['version']}")
+    print(f"Snapshot: {SNAPSHOT_PATH} ({size} bytes)")
+    print(f"Compile time: {compile_ms:.2f} ms, load time: {load_seconds * 1000:.2f} ms")
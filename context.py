@@ -0,0 +1,188 @@
+"""
+Conversation Context
+Fits a session's history into a token budget for the LLM prompt
+
+The prompt is a static instruction prefix (identical for every request, so it
+can be cached by the provider), a rolling summary of older turns, the most
+recent turns verbatim and the new message. Turns that fall out of the recent
+window are folded into the summary once, when they leave it, and the summary
+drops its oldest lines when it is full, so building a prompt costs the same
+at turn 5 as at turn 500.
+
+Tokens are estimated from characters (about 4 per token for English text);
+budgets are approximate by design.
+"""
+
+import threading
+from collections import deque
+
+CHARS_PER_TOKEN = 4
+
+# Default budgets in estimated tokens
+RECENT_TOKENS = 768
+SUMMARY_TOKENS = 256
+# Longest single message kept verbatim in the recent window
+MAX_TURN_TOKENS = 200
+# Characters kept per summarized turn
+SUMMARY_LINE_CHARS = 120
+MAX_TOPICS = 8
+
+PROMPT_PREFIX = """You are Neonexus First Responder, an emergency medical assistant.
+Respond in a helpful, professional manner. If it's a casual greeting or question, respond warmly.
+If it's asking about first aid or safety, provide helpful information.
+Always remind about calling 108/112 for real emergencies.
+Keep response concise and practical.
+Use the conversation so far for context; don't ask for details the user already gave.
+"""
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def clip(text, max_chars):
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + '…'
+
+
+def first_sentence(text):
+    text = ' '.join(text.replace('*', '').split())
+    for mark in ('. ', '! ', '? '):
+        index = text.find(mark)
+        if index != -1:
+            text = text[:index + 1]
+    return text
+
+
+class ConversationContext:
+    """Rolling summary plus recent turns for one session, both within fixed budgets"""
+
+    def __init__(self, recent_tokens=RECENT_TOKENS, summary_tokens=SUMMARY_TOKENS):
+        self.recent_budget = recent_tokens
+        self.summary_budget = summary_tokens
+        self.recent = deque()
+        self.recent_tokens = 0
+        self.summary = deque()
+        self.summary_tokens = 0
+        self.topics = {}
+        self.turns = 0
+        self._rendered = None
+        self._lock = threading.Lock()
+
+    def add_turn(self, user_message, response, emergency_type=None):
+        """Record a finished exchange; O(1) amortized"""
+        if emergency_type and emergency_type != 'casual':
+            # Protocol text is in the catalog; resending it would only spend the budget
+            self.topics.pop(emergency_type, None)
+            self.topics[emergency_type] = True
+            if len(self.topics) > MAX_TOPICS:
+                self.topics.pop(next(iter(self.topics)))
+            response = f"[gave the {emergency_type.replace('_', ' ')} first aid steps]"
+        with self._lock:
+            self.turns += 1
+            self._push_recent('User', user_message)
+            self._push_recent('Assistant', response)
+            self._rendered = None
+
+    def _push_recent(self, role, text):
+        text = clip(text, MAX_TURN_TOKENS * CHARS_PER_TOKEN)
+        line = f"{role}: {text}"
+        tokens = estimate_tokens(line)
+        self.recent.append((role, text, tokens))
+        self.recent_tokens += tokens
+        while self.recent_tokens > self.recent_budget and len(self.recent) > 1:
+            old_role, old_text, old_tokens = self.recent.popleft()
+            self.recent_tokens -= old_tokens
+            self._fold(old_role, old_text)
+
+    def _fold(self, role, text):
+        """Move one turn into the summary as a single short line"""
+        if role == 'Assistant':
+            text = first_sentence(text)
+        line = f"{role}: {clip(text, SUMMARY_LINE_CHARS)}"
+        tokens = estimate_tokens(line)
+        self.summary.append((line, tokens))
+        self.summary_tokens += tokens
+        while self.summary_tokens > self.summary_budget and self.summary:
+            _, old_tokens = self.summary.popleft()
+            self.summary_tokens -= old_tokens
+
+    def render(self):
+        """History block for the prompt, cached until the next turn"""
+        with self._lock:
+            if self._rendered is None:
+                parts = []
+                if self.topics:
+                    parts.append(f"Emergencies discussed: {', '.join(self.topics)}")
+                if self.summary:
+                    parts.append("Earlier (summary):\n" + '\n'.join(line for line, _ in self.summary))
+                if self.recent:
+                    parts.append("Recent:\n" + '\n'.join(f"{role}: {text}" for role, text, _ in self.recent))
+                self._rendered = '\n\n'.join(parts)
+            return self._rendered
+
+    def to_dict(self):
+        """
+        Plain data for a session store, token estimates included so loading
+        doesn't recount them; the rendered text is rebuilt on load
+        """
+        with self._lock:
+            return {
+                'turns': self.turns,
+                'topics': list(self.topics),
+                'summary': list(self.summary),
+                'recent': list(self.recent)
+            }
+
+    @classmethod
+    def from_dict(cls, data, **budgets):
+        context = cls(**budgets)
+        context.turns = data.get('turns', 0)
+        context.topics = dict.fromkeys(data.get('topics', ()), True)
+        context.summary.extend(map(tuple, data.get('summary', ())))
+        context.summary_tokens = sum(tokens for _, tokens in context.summary)
+        context.recent.extend(map(tuple, data.get('recent', ())))
+        context.recent_tokens = sum(tokens for _, _, tokens in context.recent)
+        return context
+
+    @classmethod
+    def from_history(cls, history, **budgets):
+        """Rebuild from a session's stored messages (at most the last 20)"""
+        context = cls(**budgets)
+        pending = None
+        for entry in history:
+            if entry.get('sender') == 'user':
+                pending = entry.get('message', '')
+            elif pending is not None:
+                context.add_turn(pending, entry.get('message', ''))
+                pending = None
+        return context
+
+
+def build_prompt(context, message):
+    """Static prefix, bounded history and the new message"""
+    message = clip(message, MAX_TURN_TOKENS * CHARS_PER_TOKEN)
+    history = context.render() if context is not None else ''
+    if history:
+        return f"{PROMPT_PREFIX}\nConversation so far:\n{history}\n\nUser message: {message}\nAssistant:"
+    return f"{PROMPT_PREFIX}\nUser message: {message}\nAssistant:"
+
+
+if __name__ == '__main__':
+    # Prompt build cost and size should stay flat as the conversation grows
+    import timeit
+    context = ConversationContext()
+    replies = ["Keep pressure on the wound with a clean cloth. Call 108/112 if bleeding doesn't stop.",
+               "Hello! I'm here to help with emergencies or answer first aid questions."]
+    print(f"{'turns':>6s} {'prompt tokens':>14s} {'build us':>9s}")
+    turn = 0
+    for target in (1, 10, 100, 1000, 10000):
+        while turn < target:
+            context.add_turn(f"question number {turn} about a deep cut on my hand that keeps bleeding",
+                             replies[turn % 2], 'bleeding' if turn % 10 == 0 else 'casual')
+            turn += 1
+        prompt = build_prompt(context, 'what should I do next?')
+        # Rebuild the history each time, as happens once per new turn
+        seconds = timeit.timeit(lambda: (setattr(context, '_rendered', None),
+                                         build_prompt(context, 'what should I do next?')), number=2000)
+        print(f"{turn:6d} {estimate_tokens(prompt):14d} {seconds / 2000 * 1e6:9.1f}")
@@ -0,0 +1,183 @@
+"""
+Event Log
+Structured JSON-lines logging that never blocks a request thread on I/O
+Records go through a bounded queue to a background writer that batch-flushes to file
+
+Configuration (environment):
+    LOG_FILE           output file (default logs/events.jsonl)
+    LOG_QUEUE_SIZE     maximum queued records before dropping (default 10000)
+    LOG_SAMPLE_RATES   per-category sampling, e.g. "ai_detection=0.1,chat=0.5"
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LOG_FILE = os.getenv('LOG_FILE', os.path.join(BASE_DIR, 'logs', 'events.jsonl'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+# Writer batching
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.5
+
+# When the queue is this full, non-error records are sampled down
+OVERLOAD_THRESHOLD = 0.75
+OVERLOAD_SAMPLE_RATE = 0.1
+
+# Seconds to wait for queued records at interpreter exit
+EXIT_DRAIN_TIMEOUT = 2.0
+
+
+def parse_sample_rates(value):
+    """Parse "category=rate,category=rate" into a dict"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        category, rate = item.split('=', 1)
+        try:
+            rates[category.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class EventLogger:
+    """
+    Non-blocking structured logger
+    log() only samples and enqueues; formatting and file writes happen on the writer thread
+    """
+
+    def __init__(self, path=LOG_FILE, queue_size=LOG_QUEUE_SIZE, sample_rates=None):
+        self.path = path
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.queue_size = queue_size
+        self.sample_rates = dict(sample_rates or {})
+        self.dropped = {}
+        self.sampled_out = {}
+        self.written = 0
+        self._random = random.Random()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='eventlog-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def log(self, category, event, level='info', **fields):
+        """Queue a record; never blocks, drops when the queue is full"""
+        if level != 'error':
+            rate = self.sample_rates.get(category, 1.0)
+            if self.queue.qsize() >= self.queue_size * OVERLOAD_THRESHOLD:
+                rate *= OVERLOAD_SAMPLE_RATE
+            if rate < 1.0 and self._random.random() >= rate:
+                self.sampled_out[category] = self.sampled_out.get(category, 0) + 1
+                return
+
+        if self._thread is None:
+            self.start()
+        record = (time.time(), level, category, event, fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[category] = self.dropped.get(category, 0) + 1
+
+    def info(self, category, event, **fields):
+        self.log(category, event, 'info', **fields)
+
+    def warning(self, category, event, **fields):
+        self.log(category, event, 'warning', **fields)
+
+    def error(self, category, event, **fields):
+        self.log(category, event, 'error', **fields)
+
+    def _format(self, record):
+        timestamp, level, category, event, fields = record
+        entry = {
+            'ts': datetime.fromtimestamp(timestamp).isoformat(),
+            'level': level,
+            'category': category,
+            'event': event
+        }
+        entry.update(fields)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+    def _run(self):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            while True:
+                batch = []
+                try:
+                    record = self.queue.get(timeout=FLUSH_INTERVAL)
+                except queue.Empty:
+                    continue
+                if record is None:
+                    return
+                batch.append(record)
+
+                # Group everything already queued into one write
+                stop = False
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        record = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        stop = True
+                        break
+                    batch.append(record)
+
+                lines = []
+                for item in batch:
+                    try:
+                        lines.append(self._format(item))
+                    except (TypeError, ValueError) as e:
+                        lines.append(json.dumps({'level': 'error', 'category': 'eventlog',
+                                                 'event': 'unserializable_record', 'error': str(e)}))
+                f.write('\n'.join(lines) + '\n')
+                f.flush()
+                self.written += len(batch)
+                if stop:
+                    return
+
+    def after_fork(self):
+        """Drop the parent's writer thread and queue in a forked child; log() restarts it"""
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def close(self, timeout=EXIT_DRAIN_TIMEOUT):
+        """Write out queued records and stop the writer"""
+        thread = self._thread
+        if not thread:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': dict(self.dropped),
+            'sampled_out': dict(self.sampled_out)
+        }
+
+
+event_log = EventLogger(sample_rates=parse_sample_rates(os.getenv('LOG_SAMPLE_RATES')))
+os.register_at_fork(after_in_child=event_log.after_fork)
@@ -0,0 +1,68 @@
+"""
+Fast JSON
+Flask JSON provider that uses orjson when it is installed and falls back to
+the standard library, plus helpers for sending pre-encoded payloads as raw bytes
+"""
+
+import json
+
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_MIMETYPE = 'application/json'
+
+
+def encode(obj):
+    """Encode compact, key-sorted JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+def decode(data):
+    """Parse JSON from bytes or str"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def raw_json_response(body, status=200):
+    """Send already-encoded JSON bytes without re-encoding"""
+    return Response(body, status=status, mimetype=JSON_MIMETYPE)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    DefaultJSONProvider with orjson for dumps/loads and response()
+    Types orjson can't handle go through Flask's default() hook
+    """
+
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def backend_name():
+    return 'orjson' if orjson is not None else 'json'
@@ -0,0 +1,148 @@
+"""
+LLM Backends
+Pluggable model interface for get_ai_response: the Gemini client, or a local
+stand-in with configurable latency, error rate and streaming for load tests
+
+Any object with generate_content(prompt, stream=False) returning a response
+with a .text attribute (or an iterator of chunks when streaming) can be used.
+
+Configuration (environment):
+    LLM_BACKEND            gemini (default) or fake
+    FAKE_LLM_LATENCY       fixed, uniform or lognormal (default lognormal)
+    FAKE_LLM_LATENCY_MS    median latency in milliseconds (default 800)
+    FAKE_LLM_JITTER        spread: uniform +/- fraction, or lognormal sigma (default 0.5)
+    FAKE_LLM_ERROR_RATE    fraction of calls that raise (default 0)
+    FAKE_LLM_CHUNKS        chunks per streamed response (default 8)
+    FAKE_LLM_SEED          seed for reproducible runs
+"""
+
+import math
+import os
+import random
+import threading
+import time
+
+from eventlog import event_log
+
+GEMINI_MODEL_NAME = 'gemini-pro'
+GEMINI_PLACEHOLDER_KEY = 'your_gemini_api_key_here'
+
+FAKE_REPLIES = [
+    "I'm here to help. For any real emergency, call 108/112 right away. "
+    "Tell me what happened and I'll guide you step by step.",
+    "Good question! Keep a basic first aid kit at home: bandages, gauze, antiseptic, "
+    "gloves and a list of emergency numbers. Always call 108/112 for real emergencies.",
+    "Hello! I'm Neonexus First Responder. I can walk you through first aid for "
+    "choking, bleeding, burns, fractures and more. Remember to call 108/112 in an emergency.",
+]
+
+
+class FakeModelError(Exception):
+    """Injected failure from the fake model"""
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGenerativeModel:
+    """Local stand-in for genai.GenerativeModel"""
+
+    def __init__(self, latency='lognormal', latency_ms=800.0, jitter=0.5,
+                 error_rate=0.0, chunks=8, seed=None):
+        if latency not in ('fixed', 'uniform', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.latency = latency
+        self.latency_ms = float(latency_ms)
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+        self.chunks = max(int(chunks), 1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self):
+        """Seconds to wait for one response"""
+        with self._lock:
+            if self.latency == 'fixed':
+                ms = self.latency_ms
+            elif self.latency == 'uniform':
+                ms = self._random.uniform(self.latency_ms * (1 - self.jitter), self.latency_ms * (1 + self.jitter))
+            else:
+                ms = self._random.lognormvariate(math.log(self.latency_ms), self.jitter)
+        return max(ms, 0.0) / 1000
+
+    def _should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _reply_for(self, prompt):
+        return FAKE_REPLIES[sum(map(ord, prompt[-64:])) % len(FAKE_REPLIES)]
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return self._stream(prompt)
+        time.sleep(self.sample_latency())
+        if self._should_fail():
+            raise FakeModelError("Injected fake LLM failure")
+        return FakeResponse(self._reply_for(prompt))
+
+    def _stream(self, prompt):
+        """Yield the reply in chunks, spreading the latency across them"""
+        total = self.sample_latency()
+        fail_at = None
+        if self._should_fail():
+            with self._lock:
+                fail_at = self._random.randrange(self.chunks)
+        words = self._reply_for(prompt).split(' ')
+        size = math.ceil(len(words) / self.chunks)
+        for index in range(self.chunks):
+            time.sleep(total / self.chunks)
+            if index == fail_at:
+                raise FakeModelError("Injected fake LLM failure mid-stream")
+            chunk = ' '.join(words[index * size:(index + 1) * size])
+            if chunk:
+                yield FakeResponse(chunk + ('' if index == self.chunks - 1 else ' '))
+
+
+def create_fake_model():
+    """Fake model configured from FAKE_LLM_* environment variables"""
+    seed = os.getenv('FAKE_LLM_SEED')
+    return FakeGenerativeModel(
+        latency=os.getenv('FAKE_LLM_LATENCY', 'lognormal'),
+        latency_ms=float(os.getenv('FAKE_LLM_LATENCY_MS', '800')),
+        jitter=float(os.getenv('FAKE_LLM_JITTER', '0.5')),
+        error_rate=float(os.getenv('FAKE_LLM_ERROR_RATE', '0')),
+        chunks=int(os.getenv('FAKE_LLM_CHUNKS', '8')),
+        seed=int(seed) if seed else None
+    )
+
+
+def create_gemini_model(api_key):
+    """Gemini client, or None if no usable API key is configured"""
+    if not api_key or api_key == GEMINI_PLACEHOLDER_KEY:
+        event_log.warning('llm', 'not_configured', backend='gemini')
+        return None
+    try:
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        model = genai.GenerativeModel(GEMINI_MODEL_NAME)
+        event_log.info('llm', 'configured', backend='gemini', model=GEMINI_MODEL_NAME)
+        return model
+    except Exception as e:
+        event_log.error('llm', 'configuration_error', error=str(e), error_type=type(e).__name__)
+        return None
+
+
+def create_model(backend=None, api_key=None):
+    """Create the model selected by LLM_BACKEND"""
+    backend = (backend or os.getenv('LLM_BACKEND', 'gemini')).lower()
+    if backend == 'fake':
+        model = create_fake_model()
+        event_log.info('llm', 'configured', backend='fake', latency=model.latency,
+                       latency_ms=model.latency_ms, error_rate=model.error_rate)
+        return model
+    if backend != 'gemini':
+        event_log.warning('llm', 'unknown_backend', backend=backend)
+        return None
+    return create_gemini_model(api_key)
@@ -0,0 +1,183 @@
+"""
+Precache Manifest
+Everything the page needs to keep working offline, listed with content hashes
+for the service worker (static/sw.js) to precache
+
+The manifest covers the rendered index page, the scripts in static/js, the
+face-api model shards, the guide images and an offline catalog: keywords,
+protocol steps and images compiled from the catalog snapshot, so the service
+worker can answer protocol lookups on the device when the network is down.
+The protocol steps are the snapshot's, so every keyword type gets the same
+steps offline as the server gives online (see catalog.py).
+
+File hashes are cached by size and modification time, and the manifest is
+only rebuilt (with a new version) when a hash changes. The service worker is
+served with the version inside it, so browsers install an update exactly
+when the precached content changed, and fetch only the files whose hash did.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import quote
+
+from eventlog import event_log
+from fastjson import encode
+from render import render_html
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_WORKER_PATH = os.path.join(BASE_DIR, 'static', 'sw.js')
+
+# (directory, pattern) of static files to precache, relative to BASE_DIR
+PRECACHE_FILES = (
+    ('static/js', '*.js'),
+    ('static/models', '*'),
+    ('static/images', '*'),
+)
+
+INDEX_URL = '/'
+OFFLINE_CATALOG_URL = '/offline/catalog.json'
+# Emergency types named in the offline reply
+OFFLINE_EXAMPLES = 4
+
+# Seconds between file checks when the manifest is requested
+CHECK_INTERVAL = 1.0
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def offline_protocols(snapshot):
+    """Protocol text and HTML for every emergency type the keywords can detect"""
+    return {name: {'text': text, 'html': snapshot['protocol_html'][name]}
+            for name, text in snapshot['protocol_text'].items()}
+
+
+def offline_catalog(snapshot, universal_reply, offline_reply):
+    """
+    Compiled tables for on-device lookups, as JSON bytes
+    Keywords keep the server's order, since the first matching type wins
+    offline_reply names a few of the types that have steps offline in place of {examples}
+    """
+    protocols = offline_protocols(snapshot)
+    examples = [name.replace('_', ' ') for name, _ in snapshot['keywords'] if name in protocols][:OFFLINE_EXAMPLES]
+    offline_reply = offline_reply.format(examples=f"{', '.join(examples[:-1])} or {examples[-1]}")
+    replies = {'universal': universal_reply, 'offline': offline_reply}
+    return encode({
+        'version': snapshot['version'],
+        'keywords': snapshot['keywords'],
+        'protocols': protocols,
+        'replies': {name: {'text': text, 'html': render_html(text)} for name, text in replies.items()},
+        'images': snapshot['images']
+    })
+
+
+class PrecacheManifest:
+    """
+    Versioned list of precached URLs with their hashes and sizes
+    generated maps a URL to a function returning its current content (bytes),
+    for responses that are rendered rather than read from a file
+    """
+
+    def __init__(self, generated, root=BASE_DIR, files=PRECACHE_FILES):
+        self.generated = generated
+        self.root = root
+        self.files = files
+        self.version = None
+        self.json = None
+        self.total_bytes = 0
+        self.entries = []
+        self.builds = 0
+        self._hashes = {}
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _file_entries(self):
+        hashes = {}
+        for directory, pattern in self.files:
+            for path in sorted(glob.glob(os.path.join(self.root, directory, pattern))):
+                if not os.path.isfile(path):
+                    continue
+                stat = os.stat(path)
+                key = (stat.st_size, stat.st_mtime_ns)
+                cached = self._hashes.get(path)
+                if cached is None or cached[0] != key:
+                    with open(path, 'rb') as f:
+                        cached = (key, content_hash(f.read()))
+                hashes[path] = cached
+                url = '/' + quote(os.path.relpath(path, self.root).replace(os.sep, '/'))
+                yield {'url': url, 'hash': cached[1], 'bytes': stat.st_size}
+        self._hashes = hashes
+
+    def _entries(self):
+        entries = []
+        for url, render in self.generated.items():
+            content = render()
+            entries.append({'url': url, 'hash': content_hash(content), 'bytes': len(content)})
+        entries.extend(self._file_entries())
+        return entries
+
+    def refresh(self):
+        """Rehash changed files; rebuild the manifest if any hash changed"""
+        entries = self._entries()
+        version = content_hash(json.dumps([(entry['url'], entry['hash']) for entry in entries]).encode('utf-8'))
+        if version == self.version:
+            return False
+        self.entries = entries
+        self.total_bytes = sum(entry['bytes'] for entry in entries)
+        self.json = encode({
+            'version': version,
+            'files': entries,
+            'file_count': len(entries),
+            'total_bytes': self.total_bytes
+        })
+        self.version = version
+        self.builds += 1
+        event_log.info('precache', 'manifest_built', version=version, files=len(entries),
+                       total_bytes=self.total_bytes)
+        return True
+
+    def current(self):
+        """Manifest JSON bytes, checking for changes at most once per CHECK_INTERVAL"""
+        now = time.monotonic()
+        if self.json is None or now >= self._next_check:
+            with self._lock:
+                if self.json is None or now >= self._next_check:
+                    self.refresh()
+                    self._next_check = time.monotonic() + CHECK_INTERVAL
+        return self.json
+
+    def service_worker(self):
+        """static/sw.js with the manifest version, so it changes whenever the manifest does"""
+        self.current()
+        with open(SERVICE_WORKER_PATH, encoding='utf-8') as f:
+            source = f.read()
+        return f"const PRECACHE_VERSION = {json.dumps(self.version)};\n{source}"
+
+    def stats(self):
+        return {
+            'version': self.version,
+            'files': len(self.entries),
+            'total_bytes': self.total_bytes,
+            'builds': self.builds
+        }
+
+
+if __name__ == '__main__':
+    # Report what a first offline-ready visit downloads
+    from app import create_app
+    app = create_app({'LOAD_DOTENV': False, 'PRELOAD': True})
+    manifest = app.extensions['neonexus'].precache
+    manifest.current()
+    print(f"{'url':60s} {'bytes':>10s}")
+    for entry in sorted(manifest.entries, key=lambda entry: -entry['bytes']):
+        print(f"{entry['url'][:60]:60s} {entry['bytes']:10,d}")
+    print(f"{'total':60s} {manifest.total_bytes:10,d} ({manifest.total_bytes / 1024 / 1024:.2f} MB)")
+    manifest._next_check = 0.0
+    start = time.perf_counter()
+    manifest.current()
+    print(f"Unchanged re-check: {(time.perf_counter() - start) * 1000:.2f} ms, builds {manifest.builds}")
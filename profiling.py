@@ -0,0 +1,173 @@
+"""
+Profiling Hooks
+On-demand cProfile sampling of live requests and tracemalloc growth reports,
+switched on at runtime without a redeploy or restart
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from eventlog import event_log
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Upper bounds so a mistaken request cannot profile forever
+MAX_PROFILE_REQUESTS = 1000
+MAX_PROFILE_SECONDS = 600
+
+# Frames kept per traced allocation
+TRACEMALLOC_FRAMES = 5
+
+
+class RequestProfiler:
+    """
+    Profiles the next N requests or every request within a time window
+    Stats from all profiled requests are combined into one report
+    """
+
+    def __init__(self, output_dir=PROFILE_DIR):
+        self.output_dir = output_dir
+        self.remaining = 0
+        self.deadline = None
+        self.stats = None
+        self.profiled = 0
+        self.last_report = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.remaining > 0 or self.deadline is not None
+
+    def arm(self, requests=None, seconds=None):
+        """Start profiling the next `requests` requests or for `seconds` seconds"""
+        with self._lock:
+            if seconds:
+                self.deadline = time.monotonic() + min(float(seconds), MAX_PROFILE_SECONDS)
+                self.remaining = 0
+            else:
+                self.remaining = min(int(requests or 1), MAX_PROFILE_REQUESTS)
+                self.deadline = None
+            self.stats = None
+            self.profiled = 0
+        return self.status()
+
+    def should_profile(self):
+        """Claim a profiling slot for the current request"""
+        if not self.active:
+            return False
+        with self._lock:
+            if self.deadline is not None:
+                if time.monotonic() < self.deadline:
+                    return True
+                # Window ended with no request finishing after it
+                self.deadline = None
+                if self.stats is not None:
+                    self._finish()
+                return False
+            if self.remaining > 0:
+                self.remaining -= 1
+                return True
+        return False
+
+    def start(self):
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile):
+        """Add a finished request's profile and write the report once done"""
+        profile.disable()
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+            self.profiled += 1
+            window_over = self.deadline is not None and time.monotonic() >= self.deadline
+            if window_over or (self.deadline is None and self.remaining == 0):
+                self.deadline = None
+                self._finish()
+
+    def _finish(self):
+        """Hand the combined stats to a background thread; the files aren't written on a request thread"""
+        stats, profiled = self.stats, self.profiled
+        self.stats = None
+        threading.Thread(target=self._write_report, args=(stats, profiled),
+                         name='profile-report', daemon=True).start()
+
+    def _write_report(self, stats, profiled):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}"
+        prof_path = os.path.join(self.output_dir, f"{name}.prof")
+        text_path = os.path.join(self.output_dir, f"{name}.txt")
+
+        stats.dump_stats(prof_path)
+        buffer = io.StringIO()
+        pstats.Stats(prof_path, stream=buffer).sort_stats('cumulative').print_stats(40)
+        with open(text_path, 'w') as f:
+            f.write(f"Profiled requests: {profiled}\n")
+            f.write(buffer.getvalue())
+
+        self.last_report = {'requests': profiled, 'prof': prof_path, 'text': text_path}
+        event_log.info('profiling', 'report_written', requests=profiled, path=text_path)
+
+    def status(self):
+        return {
+            'active': self.active,
+            'remaining_requests': self.remaining,
+            'seconds_left': round(max(self.deadline - time.monotonic(), 0), 1) if self.deadline else None,
+            'profiled': self.profiled,
+            'last_report': self.last_report
+        }
+
+
+class MemoryTracker:
+    """tracemalloc snapshots compared against a baseline to show what is growing"""
+
+    def __init__(self):
+        self.baseline = None
+        self.started_at = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.baseline = tracemalloc.take_snapshot()
+        self.started_at = datetime.now().isoformat()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+        self.started_at = None
+
+    def report(self, top=20):
+        """Largest allocation growth by source line since the baseline"""
+        if self.baseline is None:
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        growth = []
+        for stat in snapshot.compare_to(self.baseline, 'lineno')[:top]:
+            frame = stat.traceback[0]
+            growth.append({
+                'location': f"{frame.filename}:{frame.lineno}",
+                'size_diff_bytes': stat.size_diff,
+                'size_bytes': stat.size,
+                'count_diff': stat.count_diff
+            })
+        return {
+            'baseline_at': self.started_at,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'growth': growth
+        }
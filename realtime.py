@@ -0,0 +1,361 @@
+"""
+Realtime Chat
+WebSocket channel for the chat page: the session is bound once on connect, then
+chat turns, protocol step streams and camera detection events share one
+long-lived connection, and the server can push escalations without polling
+
+Run next to the HTTP server and point the page at it with REALTIME_URL:
+    REALTIME_URL=:5001/ws python serve.py --workers 2
+    python realtime.py --port 5001
+
+Frames are JSON text:
+    client -> server
+        {"type": "message", "id": 1, "message": "someone is choking"}
+        {"type": "detection", "emergency": "unconscious", "emotion": "fear"}
+        {"type": "reset"}
+        {"type": "ping"}
+    server -> client
+        {"type": "session", "session_id": "..."}                        after connecting
+        {"type": "step", "id": 1, "index": 0, "total": 6, "html": "..."}  protocol steps, streamed
+        {"type": "reply", "id": 1, ...}                                 same fields as /send_message
+        {"type": "escalation", "emergency_type": "...", ...}            pushed after a camera detection
+        {"type": "pong"}, {"type": "error", "message": "..."}
+
+Connections are asyncio tasks, so thousands of idle ones fit in one process;
+only chat turns (which may block on the LLM) run in a bounded thread pool.
+Server pings close dead peers. Each connection has a bounded outgoing queue:
+when a client stops reading, droppable frames are discarded and the
+connection is closed instead of buffering replies without limit.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from app import (count_emergency, create_app, get_ai_response, get_catalog_store, get_protocol_reply_prefix,
+                 record_turn, store_turn)
+from eventlog import event_log
+from fastjson import encode
+from metrics import REALTIME_CONNECTIONS, REALTIME_FRAMES, STAGE_SECONDS
+from render import render_html, render_html_cached
+from transcript import transcript_log
+
+WS_PATH = '/ws'
+
+# Server pings; a peer that doesn't answer within the timeout is disconnected
+HEARTBEAT_INTERVAL = 20.0
+HEARTBEAT_TIMEOUT = 20.0
+
+# Same limit as /ai_detection; chat messages are far smaller
+MAX_FRAME_BYTES = 16 * 1024
+MAX_MESSAGE_CHARS = 2000
+
+# Received frames buffered per connection while a turn runs; beyond this the
+# socket is no longer read, so a flooding client is slowed by TCP itself
+MAX_INCOMING_FRAMES = 8
+# Sent frames queued per connection before it is treated as too slow
+MAX_OUTGOING_FRAMES = 64
+# Bytes buffered in the socket before send() waits for the client to read
+WRITE_LIMIT = 32 * 1024
+
+# Threads running chat turns (classification, search and LLM calls)
+TURN_WORKERS = 32
+
+# Minimum seconds between camera escalations for one session
+ESCALATION_COOLDOWN = 10.0
+
+# Frames that may be dropped for a slow client; anything else closes the connection
+DROPPABLE_FRAMES = {'pong', 'error'}
+
+
+def split_steps(text):
+    """Group protocol lines into steps; header lines go with the first step"""
+    groups = [[]]
+    for line in text.split('\n'):
+        if 'STEP' in line and any('STEP' in previous for previous in groups[-1]):
+            groups.append([])
+        groups[-1].append(line)
+    return groups
+
+
+@lru_cache(maxsize=64)
+def protocol_steps(emergency_type, version):
+    """Rendered HTML for each step of a compiled protocol (version keys the cache to the catalog)"""
+    text = get_catalog_store().current()['protocol_text'].get(emergency_type)
+    if not text:
+        return ()
+    return tuple(render_html('\n'.join(group)) for group in split_steps(text))
+
+
+def step_frames(turn_id, emergency_type):
+    steps = protocol_steps(emergency_type, get_catalog_store().current()['version'])
+    return [('step', encode({'type': 'step', 'id': turn_id, 'index': index, 'total': len(steps),
+                             'html': html}).decode('utf-8'))
+            for index, html in enumerate(steps)]
+
+
+def reply_frame(turn_id, session_id, response, emergency_type):
+    """The /send_message reply plus type and id, pre-encoded for compiled protocols"""
+    reply_prefix = get_protocol_reply_prefix(response, emergency_type)
+    if reply_prefix:
+        return (reply_prefix + b'"id":' + encode(turn_id) + b',"session_id":' + encode(session_id) +
+                b',"status":"success","type":"reply"}').decode('utf-8')
+    return encode({
+        'type': 'reply',
+        'id': turn_id,
+        'status': 'success',
+        'response': response,
+        'response_html': render_html_cached(response),
+        'session_id': session_id,
+        'emergency_type': emergency_type if emergency_type != 'casual' else None
+    }).decode('utf-8')
+
+
+class Connection:
+    """One client socket with its bounded outgoing queue"""
+
+    def __init__(self, websocket, session_id):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.outgoing = asyncio.Queue(MAX_OUTGOING_FRAMES)
+
+    def push(self, kind, frame):
+        """Queue an encoded frame for the writer; never waits"""
+        try:
+            self.outgoing.put_nowait(frame)
+        except asyncio.QueueFull:
+            REALTIME_FRAMES.inc('dropped', kind)
+            if kind not in DROPPABLE_FRAMES:
+                # The client isn't reading; free its buffers rather than grow them
+                asyncio.ensure_future(self.websocket.close(1013, 'Client too slow'))
+            return False
+        REALTIME_FRAMES.inc('out', kind)
+        return True
+
+    async def write_loop(self):
+        try:
+            while True:
+                frame = await self.outgoing.get()
+                # Waits while more than WRITE_LIMIT bytes are unsent
+                await self.websocket.send(frame)
+        except ConnectionClosed:
+            pass
+
+
+class RealtimeHub:
+    """Connections by session, so turns and escalations reach every tab of a session"""
+
+    def __init__(self, app, workers=TURN_WORKERS):
+        self.app = app
+        self.state = app.extensions['neonexus']
+        self.sessions = {}
+        self.last_escalation = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chat-turn')
+
+    def connection_count(self):
+        return sum(len(connections) for connections in self.sessions.values())
+
+    def push(self, session_id, kind, frame):
+        """Send a frame to every connection bound to the session"""
+        for connection in tuple(self.sessions.get(session_id, ())):
+            connection.push(kind, frame)
+
+    def bind(self, requested_id):
+        """The page's own session id, shared with the HTTP workers through the session store"""
+        return self.state.sessions.resolve(requested_id)
+
+    def run_turn(self, session_id, turn_id, message):
+        """One chat turn on a worker thread; returns the frames to send"""
+        with self.app.app_context():
+            STAGE_SECONDS.begin_request()
+            try:
+                trace = {}
+                response, emergency_type = get_ai_response(message, session_id, None, trace)
+                count_emergency(emergency_type)
+                record_turn('ws', session_id, message, response, emergency_type, trace)
+                store_turn(session_id, message, response, emergency_type)
+                # Only compiled protocols are streamed step by step; a search reply for the same
+                # type (e.g. infant choking steps) must not be preceded by the adult protocol
+                frames = []
+                if trace.get('route') == 'protocol':
+                    with STAGE_SECONDS.time('render'):
+                        frames = step_frames(turn_id, emergency_type)
+                with STAGE_SECONDS.time('serialize'):
+                    frames.append(('reply', reply_frame(turn_id, session_id, response, emergency_type)))
+                return frames
+            finally:
+                STAGE_SECONDS.end_request()
+
+    def escalate(self, session_id, emergency_type, reason):
+        """Push a protocol to the session without waiting for the user to ask"""
+        now = time.monotonic()
+        if now - self.last_escalation.get(session_id, 0.0) < ESCALATION_COOLDOWN:
+            return False
+        snapshot = get_catalog_store().current()
+        response = snapshot['protocol_text'].get(emergency_type)
+        if not response:
+            return False
+        self.last_escalation[session_id] = now
+        self.push(session_id, 'escalation', encode({
+            'type': 'escalation',
+            'reason': reason,
+            'emergency_type': emergency_type,
+            'response': response,
+            'response_html': snapshot['protocol_html'][emergency_type]
+        }).decode('utf-8'))
+        event_log.warning('realtime', 'escalation', session_id=session_id,
+                          emergency_type=emergency_type, reason=reason)
+        return True
+
+    async def dispatch(self, connection, raw):
+        try:
+            data = json.loads(raw)
+            kind = data.get('type')
+        except (ValueError, AttributeError):
+            REALTIME_FRAMES.inc('in', 'invalid')
+            connection.push('error', encode({'type': 'error', 'message': 'Invalid frame'}).decode('utf-8'))
+            return
+        REALTIME_FRAMES.inc('in', kind if kind in ('message', 'detection', 'reset', 'ping') else 'unknown')
+
+        if kind == 'message':
+            message = str(data.get('message', '')).strip()[:MAX_MESSAGE_CHARS]
+            if not message:
+                connection.push('error', encode({'type': 'error', 'id': data.get('id'),
+                                                 'message': 'Please type a message.'}).decode('utf-8'))
+                return
+            loop = asyncio.get_running_loop()
+            try:
+                frames = await loop.run_in_executor(self.executor, self.run_turn,
+                                                    connection.session_id, data.get('id'), message)
+            except Exception as e:
+                event_log.error('realtime', 'turn_error', error=str(e), error_type=type(e).__name__)
+                connection.push('reply', encode({
+                    'type': 'reply', 'id': data.get('id'), 'status': 'error',
+                    'response': 'System error. Please try again or call 108/112 for emergencies.'
+                }).decode('utf-8'))
+                return
+            # Steps go to this connection only; the finished reply to every tab of the session
+            for frame_kind, frame in frames[:-1]:
+                connection.push(frame_kind, frame)
+            self.push(connection.session_id, *frames[-1])
+
+        elif kind == 'detection':
+            event_log.info('ai_detection', 'detection', payload=data, session_id=connection.session_id)
+            transcript_log.record('detection', session_id=connection.session_id, channel='ws', payload=data)
+            emergency = data.get('emergency')
+            if isinstance(emergency, str):
+                self.escalate(connection.session_id, emergency, 'camera')
+
+        elif kind == 'reset':
+            self.state.reset_session(connection.session_id)
+            connection.push('reset', encode({'type': 'reset', 'status': 'success'}).decode('utf-8'))
+
+        elif kind == 'ping':
+            connection.push('pong', '{"type":"pong"}')
+
+        else:
+            connection.push('error', encode({'type': 'error', 'message': f"Unknown frame type: {kind}"}).decode('utf-8'))
+
+    async def handle(self, websocket):
+        query = parse_qs(urlsplit(websocket.request.path).query)
+        session_id = self.bind(query.get('session_id', [None])[0])
+        connection = Connection(websocket, session_id)
+        self.sessions.setdefault(session_id, set()).add(connection)
+        REALTIME_CONNECTIONS.inc('opened')
+        writer = asyncio.create_task(connection.write_loop())
+        connection.push('session', encode({'type': 'session', 'session_id': session_id}).decode('utf-8'))
+        try:
+            async for raw in websocket:
+                await self.dispatch(connection, raw)
+        except ConnectionClosed:
+            pass
+        finally:
+            writer.cancel()
+            connections = self.sessions.get(session_id)
+            if connections is not None:
+                connections.discard(connection)
+                if not connections:
+                    del self.sessions[session_id]
+                    self.last_escalation.pop(session_id, None)
+            REALTIME_CONNECTIONS.inc('closed')
+
+    def process_request(self, websocket, request):
+        """Plain HTTP on the WebSocket port: /ready for health checks, 404 for anything else"""
+        path = urlsplit(request.path).path
+        if path == '/ready':
+            report = self.state.readiness()
+            report['connections'] = self.connection_count()
+            return websocket.respond(200 if report['status'] == 'ready' else 503, json.dumps(report))
+        if path != WS_PATH:
+            return websocket.respond(404, 'Not found\n')
+        return None
+
+
+def is_rejected_handshake(record):
+    """/ready and 404 answers from process_request are logged as failed handshakes; skip them"""
+    return not (record.exc_info and isinstance(record.exc_info[1], InvalidStatus))
+
+
+def raise_open_file_limit():
+    """Each connection is a file descriptor; allow as many as the hard limit permits"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+            soft = hard
+        except (ValueError, OSError):
+            pass
+    return soft
+
+
+async def run_server(hub, host, port, max_files):
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+
+    # Compression is off: per-connection deflate buffers cost far more than these small frames save
+    async with serve(hub.handle, host, port, process_request=hub.process_request,
+                     compression=None, ping_interval=HEARTBEAT_INTERVAL, ping_timeout=HEARTBEAT_TIMEOUT,
+                     max_size=MAX_FRAME_BYTES, max_queue=MAX_INCOMING_FRAMES,
+                     write_limit=WRITE_LIMIT) as server:
+        print(f"🔌 Realtime chat on ws://{host}:{port}{WS_PATH} (max {max_files} open files)")
+        await stop
+        print(f"🛑 Closing {hub.connection_count()} connections")
+        hub.state.draining = True
+        server.close()
+        await server.wait_closed()
+    hub.executor.shutdown(wait=True)
+    print("✅ Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus realtime chat server')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'), help='Bind address')
+    parser.add_argument('--port', type=int, default=int(os.getenv('REALTIME_PORT', '5001')), help='Bind port')
+    parser.add_argument('--turn-workers', type=int, default=TURN_WORKERS,
+                        help='Threads running chat turns concurrently')
+    args = parser.parse_args()
+
+    logging.getLogger('websockets.server').addFilter(is_rejected_handshake)
+    max_files = raise_open_file_limit()
+    app = create_app()
+    hub = RealtimeHub(app, workers=args.turn_workers)
+    asyncio.run(run_server(hub, args.host, args.port, max_files))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Reply Rendering
+Turns reply text (with **bold** markup and indented sub-steps) into
+sanitized HTML fragments so clients don't have to re-parse it, and
+minifies the index page's inline CSS for the inlined-assets build
+"""
+
+import html
+import re
+from functools import lru_cache
+
+BOLD_PATTERN = re.compile(r"\*\*(.*?)\*\*")
+STEP_PATTERN = re.compile(r"(?<!<strong>)(STEP\s*\d+[:.]?)", re.IGNORECASE)
+
+CSS_COMMENT_PATTERN = re.compile(r"/\*.*?\*/", re.DOTALL)
+CSS_SPACE_PATTERN = re.compile(r"\s*([{};,>])\s*|:\s+")
+STYLE_PATTERN = re.compile(r"(<style>)(.*?)(</style>)", re.DOTALL)
+
+# Canned replies repeat constantly; LLM replies are bounded by the cache size
+RENDER_CACHE_SIZE = 512
+
+
+def render_line(line):
+    """Render a single line of reply text"""
+    is_sub_step = line.startswith(' ') and line.strip()
+    text = html.escape(line.strip() if is_sub_step else line, quote=False)
+    text = BOLD_PATTERN.sub(r"<strong>\1</strong>", text)
+    text = STEP_PATTERN.sub(r"<strong>\1</strong>", text)
+    if is_sub_step:
+        return f'<span class="sub-step">{text}</span>'
+    return text
+
+
+def render_html(text):
+    """Render reply text as an escaped HTML fragment"""
+    return "<br>".join(render_line(line) for line in text.split("\n"))
+
+
+@lru_cache(maxsize=RENDER_CACHE_SIZE)
+def render_html_cached(text):
+    """render_html for replies that are not precompiled in the catalog"""
+    return render_html(text)
+
+
+def minify_css(css):
+    """Drop comments and whitespace that doesn't change the stylesheet"""
+    css = ' '.join(CSS_COMMENT_PATTERN.sub('', css).split())
+    css = CSS_SPACE_PATTERN.sub(lambda match: match.group(1) or ':', css)
+    return css.replace(';}', '}')
+
+
+def minify_inline_styles(page):
+    """minify_css applied to every <style> block of an HTML page"""
+    return STYLE_PATTERN.sub(lambda match: match.group(1) + minify_css(match.group(2)) + match.group(3), page)
@@ -0,0 +1,249 @@
+"""
+Protocol Search Index
+Inverted index with BM25 scoring over every step of every BCLS protocol
+"""
+
+import heapq
+import math
+import re
+
+from protocols import PROTOCOL_MAP
+
+# Protocol variants selected through keyword arguments
+PROTOCOL_VARIANTS = {
+    'choking': [{'age_group': 'adult'}, {'age_group': 'child'},
+                {'age_group': 'infant'}, {'age_group': 'pregnant'}],
+    'unconscious': [{'is_breathing': True}, {'is_breathing': False}],
+    'burn': [{'severity': 'minor'}, {'severity': 'major'}]
+}
+
+# Words too common in questions and protocol text to carry meaning
+STOPWORDS = {
+    'a', 'about', 'after', 'an', 'and', 'any', 'are', 'as', 'at', 'be', 'by',
+    'can', 'do', 'does', 'for', 'from', 'how', 'i', 'if', 'in', 'into', 'is',
+    'it', 'me', 'my', 'no', 'not', 'of', 'on', 'or', 'should', 'so', 'someone',
+    'that', 'the', 'their', 'them', 'there', 'they', 'this', 'to', 'until',
+    'use', 'using', 'was', 'what', 'when', 'where', 'which', 'who', 'why',
+    'will', 'with', 'you', 'your',
+    # Conversational words that the casual replies already handle
+    'aid', 'first', 'help', 'need', 'please', 'safety', 'thanks'
+}
+
+# Terms specific enough to answer from protocol steps on their own;
+# any other query needs at least MIN_REPLY_TERMS distinct terms in a step
+MEDICAL_TERMS = {
+    'aed', 'anaphylaxis', 'antivenom', 'cpr', 'concussion', 'defibrillator',
+    'epinephrine', 'epipen', 'frostbite', 'glucose', 'heatstroke', 'heimlich',
+    'hypoglycemia', 'hypothermia', 'insulin', 'seizure', 'seizures', 'splint',
+    'tourniquet'
+}
+
+# Everyday words for the age groups the protocol variants are written for
+SYNONYMS = {
+    'baby': 'infant', 'babies': 'infant', 'newborn': 'infant',
+    'kid': 'child', 'kids': 'child'
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Minimum score for a step to be used in a chat reply
+MIN_REPLY_SCORE = 2.5
+# Distinct query terms a step must contain unless one of them is in MEDICAL_TERMS
+MIN_REPLY_TERMS = 2
+
+# Number of steps considered and shown when building a chat reply
+REPLY_CANDIDATES = 10
+REPLY_STEPS = 4
+
+
+def tokenize(text):
+    """Split text into lowercase tokens without stemming"""
+    return [SYNONYMS.get(token, token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def protocol_title(protocol_func):
+    """Readable title from a protocol function name"""
+    name = protocol_func.__name__.replace('_protocol', '')
+    return name.replace('_', ' ').title()
+
+
+def iter_protocol_steps():
+    """
+    Yield every step of every protocol and variant
+    Sub-steps carry their parent step as context
+    """
+    for protocol_name, protocol_func in PROTOCOL_MAP.items():
+        for variant in PROTOCOL_VARIANTS.get(protocol_name, [{}]):
+            steps = protocol_func(**variant) if variant else protocol_func()
+            parent = None
+            for index, step in enumerate(steps):
+                if step.startswith(' '):
+                    context = parent
+                else:
+                    parent = step
+                    context = None
+                yield {
+                    'protocol': protocol_name,
+                    'title': protocol_title(protocol_func),
+                    'variant': variant,
+                    'step_index': index,
+                    'step': step.strip(),
+                    'context': context
+                }
+
+
+class ProtocolSearchIndex:
+    """
+    Inverted index over protocol steps
+    Postings hold (doc_id, term frequency); scoring only touches
+    the postings of the query terms
+    """
+
+    def __init__(self, documents):
+        self.documents = []
+        self.postings = {}
+        self.idf = {}
+        self.length_norms = []
+
+        lengths = []
+        for doc in documents:
+            doc_id = len(self.documents)
+            self.documents.append(doc)
+
+            text = doc['step'] if not doc['context'] else f"{doc['context']} {doc['step']}"
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                self.postings.setdefault(token, []).append((doc_id, tf))
+            lengths.append(sum(counts.values()))
+
+        total = len(self.documents)
+        avg_length = (sum(lengths) / total) if total else 0.0
+        for token, posting in self.postings.items():
+            df = len(posting)
+            self.idf[token] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+        # Precompute the length part of the BM25 denominator per document
+        self.length_norms = [
+            BM25_K1 * (1 - BM25_B + BM25_B * (length / avg_length if avg_length else 0))
+            for length in lengths
+        ]
+
+    def search(self, query, limit=5):
+        """Return the best matching steps for a query, highest score first"""
+        scores = {}
+        matched = {}
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = self.idf[token]
+            norms = self.length_norms
+            for doc_id, tf in posting:
+                score = idf * tf * (BM25_K1 + 1) / (tf + norms[doc_id])
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+                matched.setdefault(doc_id, []).append(token)
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        results = []
+        for doc_id, score in best:
+            doc = self.documents[doc_id]
+            results.append({
+                'protocol': doc['protocol'],
+                'title': doc['title'],
+                'variant': doc['variant'],
+                'step_index': doc['step_index'],
+                'step': doc['step'],
+                'context': doc['context'],
+                'score': round(score, 4),
+                'terms': sorted(matched[doc_id])
+            })
+        return results
+
+
+def build_index():
+    """Build the search index over all protocols"""
+    return ProtocolSearchIndex(iter_protocol_steps())
+
+
+def variant_label(variant):
+    """Readable variant name for a reply heading, e.g. INFANT or NOT BREATHING"""
+    labels = []
+    for key, value in variant.items():
+        if isinstance(value, bool):
+            name = key[3:] if key.startswith('is_') else key
+            labels.append(name if value else f"not {name}")
+        else:
+            labels.append(str(value))
+    return ', '.join(labels).replace('_', ' ').upper()
+
+
+def select_reply_steps(results):
+    """
+    The protocol variant that best answers the query and its steps to show, as
+    (protocol, variant, steps), or None if nothing is relevant enough
+    A step is relevant when it scores MIN_REPLY_SCORE and shares more than one
+    word with the query (or a medical term), so a single incidental word in
+    small talk ("tell me a joke") doesn't turn into protocol steps.
+    Variants are separate answers (infant choking steps must not be mixed with
+    adult ones): of the variants with a relevant step, the one whose candidate
+    steps score highest in total is used alone, so a query naming the infant
+    gets the infant steps even when another variant matches its other words
+    """
+    totals = {}
+    answerable = set()
+    for result in results:
+        key = (result['protocol'], tuple(sorted(result['variant'].items())))
+        totals[key] = totals.get(key, 0.0) + result['score']
+        if result['score'] >= MIN_REPLY_SCORE and (len(result['terms']) >= MIN_REPLY_TERMS or
+                                                   not MEDICAL_TERMS.isdisjoint(result['terms'])):
+            answerable.add(key)
+    if not answerable:
+        return None
+    protocol, variant = max(answerable, key=totals.get)
+    variant = dict(variant)
+
+    # Keep the best steps, then show them in the variant's own order
+    steps = [result for result in results if result['protocol'] == protocol and
+             result['variant'] == variant and result['score'] >= MIN_REPLY_SCORE]
+    chosen = steps[:REPLY_STEPS]
+    chosen.sort(key=lambda result: result['step_index'])
+    return protocol, variant, chosen
+
+
+def format_search_reply(results):
+    """Format search results as a chat reply, or None if nothing is relevant enough"""
+    selected = select_reply_steps(results)
+    if selected is None:
+        return None
+    protocol, variant, chosen = selected
+
+    title = chosen[0]['title'].upper()
+    if variant:
+        title = f"{title} ({variant_label(variant)})"
+    lines = [f"🔎 **{title} - RELEVANT STEPS**"]
+    headers = set()
+    for result in chosen:
+        if not result['context']:
+            if result['step'] not in headers:
+                lines.append(f"**{result['step']}**")
+                headers.add(result['step'])
+            continue
+        if result['context'] not in headers:
+            lines.append(f"**{result['context']}**")
+            headers.add(result['context'])
+        lines.append(f"   {result['step']}")
+    lines.append("**📞 CALL 108/112 for any serious emergency**")
+    return "\n".join(lines), protocol
+
+
+if __name__ == "__main__":
+    index = build_index()
+    print(f"Indexed {len(index.documents)} steps, {len(index.postings)} terms")
+    for result in index.search("what do I do about a tourniquet"):
+        print(f"{result['score']:.2f}  [{result['protocol']}] {result['step']}")
@@ -0,0 +1,241 @@
+"""
+Production Server
+Preforking launcher: the parent loads and warms the app once, freezes the
+heap with gc.freeze() and forks worker processes that share it copy-on-write
+
+Usage:
+    python serve.py --workers 4 --port 5000
+
+Each worker serves the shared listening socket with a threaded WSGI server.
+SIGTERM or SIGINT shuts down gracefully: workers report "draining" on /ready,
+stop accepting connections and finish in-flight requests before exiting.
+Crashed workers are restarted. Set METRICS_DIR so /metrics covers all workers.
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wsgi import ClosingIterator
+
+from app import create_app, flush_emergency_rates, start_background_tasks
+from eventlog import event_log
+from metrics import registry
+from transcript import transcript_log
+
+DEFAULT_WORKERS = 2
+DEFAULT_BACKLOG = 2048
+GRACEFUL_TIMEOUT = 30.0
+
+# Don't restart workers faster than this when they keep crashing
+RESTART_DELAY = 1.0
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """
+    Access log lines go through event_log (category 'access', sampled with
+    LOG_SAMPLE_RATES) instead of a synchronous stderr write per request
+    """
+
+    def log_request(self, code='-', size='-'):
+        event_log.info('access', 'request', method=self.command, path=self.path,
+                       status=getattr(code, 'value', code), client=self.address_string())
+
+
+class InFlightTracker:
+    """WSGI middleware counting requests still being handled, so shutdown can wait for them"""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def __call__(self, environ, start_response):
+        with self._condition:
+            self.active += 1
+        try:
+            # Count the request until its body (e.g. a streamed model file) has been sent
+            return ClosingIterator(self.app(environ, start_response), self._finished)
+        except BaseException:
+            self._finished()
+            raise
+
+    def _finished(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout):
+        with self._condition:
+            return self._condition.wait_for(lambda: self.active == 0, timeout)
+
+
+def bind_socket(host, port, backlog):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port, graceful_timeout):
+    """Worker process main loop; never returns"""
+    state = app.extensions['neonexus']
+    start_background_tasks(app)
+    tracker = InFlightTracker(app)
+    server = make_server(host, port, tracker, threaded=True, request_handler=QuietRequestHandler,
+                         fd=sock.fileno())
+
+    def shutdown(signum, frame):
+        if state.draining:
+            return
+        state.draining = True
+        # shutdown() blocks until serve_forever() returns, so it can't run on the main thread
+        threading.Thread(target=server.shutdown, name='worker-shutdown', daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    code = 0
+    try:
+        server.serve_forever()
+        if not tracker.wait_idle(graceful_timeout):
+            print(f"⚠️  Worker {os.getpid()}: {tracker.active} request(s) still running at shutdown")
+    except Exception as e:
+        print(f"❌ Worker {os.getpid()} crashed: {e}")
+        code = 1
+    finally:
+        server.server_close()
+        # os._exit skips atexit, so drain the log writers and flush shared state here
+        event_log.close()
+        transcript_log.close()
+        if registry.metrics_dir:
+            try:
+                registry.flush()
+                flush_emergency_rates()
+            except OSError:
+                pass
+    os._exit(code)
+
+
+class Arbiter:
+    """Parent process: forks workers, restarts ones that die and coordinates shutdown"""
+
+    def __init__(self, app, sock, host, port, workers, graceful_timeout):
+        self.app = app
+        self.sock = sock
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children = {}
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(self.app, self.sock, self.host, self.port, self.graceful_timeout)
+        self.children[pid] = time.monotonic()
+        return pid
+
+    def reap(self):
+        """Collect exited workers; returns the number reaped"""
+        reaped = 0
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                break
+            if pid == 0:
+                break
+            started = self.children.pop(pid, None)
+            reaped += 1
+            if not self.stopping:
+                code = os.waitstatus_to_exitcode(status)
+                print(f"⚠️  Worker {pid} exited with status {code}; restarting")
+                if started is not None and time.monotonic() - started < RESTART_DELAY:
+                    time.sleep(RESTART_DELAY)
+        return reaped
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+        print(f"🚑 {self.workers} workers serving http://{self.host}:{self.port} "
+              f"(parent {os.getpid()}, workers {', '.join(map(str, self.children))})")
+
+        while not self.stopping:
+            self.reap()
+            while not self.stopping and len(self.children) < self.workers:
+                self.spawn()
+            time.sleep(0.2)
+
+        self.shutdown()
+
+    def shutdown(self):
+        print(f"🛑 Shutting down {len(self.children)} workers (graceful timeout {self.graceful_timeout:.0f} s)")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.children and time.monotonic() < deadline:
+            if not self.reap():
+                time.sleep(0.1)
+        for pid in list(self.children):
+            print(f"⚠️  Worker {pid} did not stop in time; killing")
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.children.pop(pid, None)
+        self.sock.close()
+        print("✅ Stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Neonexus production server')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'), help='Bind address')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')), help='Bind port')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', DEFAULT_WORKERS)),
+                        help='Worker processes')
+    parser.add_argument('--backlog', type=int, default=DEFAULT_BACKLOG, help='Listen backlog')
+    parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                        help='Seconds to wait for in-flight requests at shutdown')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        print("❌ serve.py needs os.fork(); use python app.py on this platform")
+        return 1
+
+    # Load and warm everything once in the parent, then keep the collector
+    # from touching (and so copying) those pages in the workers
+    gc.disable()
+    app = create_app({'PRELOAD': True})
+    state = app.extensions['neonexus']
+    print(f"✅ Warmed up in {state.warmup_ms} ms")
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    Arbiter(app, sock, args.host, args.port, max(args.workers, 1), args.graceful_timeout).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -76,6 +76,9 @@ def main():
     print("3. Run the application: python app.py")
     print("4. Open browser to: http://localhost:5000")
     print("\nFor production:")
+    print("  - Run: python serve.py --workers 4 (preforked workers, readiness at /ready)")
+    print("  - Run: python realtime.py --port 5001 with REALTIME_URL=:5001/ws (WebSocket chat)")
+    print("  - Set INLINE_ASSETS=1 (inlined critical CSS and chat script, camera code loaded on demand)")
     print("  - Change FLASK_SECRET_KEY in .env")
     print("  - Use HTTPS")
     print("  - Set up proper hosting")
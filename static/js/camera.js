@@ -360,6 +360,11 @@ class CameraSystem {
                          type === 'burn' || type === 'pain' ? 'warning' : 'danger';
         this.showStatus(`🚨 ${message}`, alertType);
         
+        // Report over the realtime channel; the server may push the matching protocol
+        if (window.emergencyApp && window.emergencyApp.sendRealtimeEvent) {
+            window.emergencyApp.sendRealtimeEvent({ type: 'detection', emergency: type, emotion: emotion });
+        }
+        
         // Send to chat system WITH CONFIRMATION BUTTONS
         if (window.emergencyApp && window.emergencyApp.addMessageToChat) {
             const chatMessage = `**🚨 AI EMERGENCY DETECTION**\n\n${message}\n\n**Emotion:** ${emotion}\n**Time:** ${new Date().toLocaleTimeString()}`;
@@ -524,18 +529,20 @@ class CameraSystem {
     }
 }
 
-// Initialize when page loads
-document.addEventListener('DOMContentLoaded', () => {
-    console.log('📄 Page loaded, starting AI camera in 3 seconds...');
+// Initialize when page loads, or right away when loaded on demand
+// (the inlined-assets page loads face-api and this file when the camera is turned on)
+function initCameraSystem() {
+    const onDemand = window.CAMERA_ON_DEMAND === true;
+    console.log(onDemand ? '📄 Camera code loaded, starting AI camera...' : '📄 Page loaded, starting AI camera in 3 seconds...');
     
     window.CameraSystem = new CameraSystem();
     
-    // Start after 3 seconds (gives time for face-api to load)
+    // Start after 3 seconds (gives time for face-api to load); on demand it is already loaded
     setTimeout(() => {
         if (window.CameraSystem && typeof window.CameraSystem.startCamera === 'function') {
             window.CameraSystem.startCamera();
         }
-    }, 3000);
+    }, onDemand ? 0 : 3000);
     
     // Setup close button
     const closeBtn = document.getElementById('close-camera');
@@ -546,6 +553,12 @@ document.addEventListener('DOMContentLoaded', () => {
             }
         });
     }
-});
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initCameraSystem);
+} else {
+    initCameraSystem();
+}
 
 console.log('✅ AI Camera System ready');
\ No newline at end of file
@@ -25,8 +25,16 @@ class EmergencyResponder {
         this.synthesis = window.speechSynthesis;
         this.lastVoiceCommand = '';
         
+        // Realtime channel (falls back to HTTP when unavailable)
+        this.realtime = null;
+        this.realtimeRetryDelay = 1000;
+        this.realtimeLastFrame = 0;
+        this.pendingReplies = new Map();
+        this.nextTurnId = 1;
+        
         // Initialize
         this.initializeSession();
+        this.connectRealtime();
         this.initializeVoiceRecognition();
         this.loadInitialMessages();
         this.setupEventListeners();
@@ -45,6 +53,123 @@ class EmergencyResponder {
         console.log('Emergency Session ID:', this.sessionId);
     }
     
+    // ===== REALTIME CHANNEL =====
+    realtimeUrl() {
+        let url = window.REALTIME_URL;
+        if (!url || !window.WebSocket) return null;
+        if (url.startsWith(':') || url.startsWith('/')) {
+            const scheme = location.protocol === 'https:' ? 'wss' : 'ws';
+            url = `${scheme}://${location.hostname}${url}`;
+        }
+        return `${url}?session_id=${encodeURIComponent(this.sessionId)}`;
+    }
+    
+    connectRealtime() {
+        const url = this.realtimeUrl();
+        if (!url) return;
+        
+        const socket = new WebSocket(url);
+        this.realtime = socket;
+        
+        socket.onopen = () => {
+            console.log('🔌 Realtime channel connected');
+            this.realtimeRetryDelay = 1000;
+            this.realtimeLastFrame = Date.now();
+            clearInterval(this.realtimeHeartbeat);
+            this.realtimeHeartbeat = setInterval(() => {
+                // No frames (not even a pong) for a while: the connection is dead
+                if (Date.now() - this.realtimeLastFrame > 60000) {
+                    socket.close();
+                } else if (socket.readyState === WebSocket.OPEN) {
+                    socket.send(JSON.stringify({ type: 'ping' }));
+                }
+            }, 25000);
+        };
+        
+        socket.onmessage = (event) => {
+            this.realtimeLastFrame = Date.now();
+            try {
+                this.handleRealtimeFrame(JSON.parse(event.data));
+            } catch (error) {
+                console.error('Realtime frame error:', error);
+            }
+        };
+        
+        socket.onclose = () => {
+            clearInterval(this.realtimeHeartbeat);
+            if (this.realtime === socket) this.realtime = null;
+            
+            // Turns still waiting are retried over HTTP
+            const pending = Array.from(this.pendingReplies.values());
+            this.pendingReplies.clear();
+            pending.forEach(turn => turn.fallback());
+            
+            setTimeout(() => this.connectRealtime(), this.realtimeRetryDelay);
+            this.realtimeRetryDelay = Math.min(this.realtimeRetryDelay * 2, 30000);
+        };
+    }
+    
+    handleRealtimeFrame(frame) {
+        if (frame.type === 'session') {
+            // The server keeps the page's id; it only differs when the stored one was unusable
+            if (frame.session_id !== this.sessionId) {
+                this.sessionId = frame.session_id;
+                localStorage.setItem('emergency_session_id', this.sessionId);
+            }
+        } else if (frame.type === 'step') {
+            if (this.pendingReplies.has(frame.id)) this.showStreamingStep(frame);
+        } else if (frame.type === 'reply') {
+            const turn = this.pendingReplies.get(frame.id);
+            if (turn) {
+                this.pendingReplies.delete(frame.id);
+                turn.resolve(frame);
+            }
+        } else if (frame.type === 'escalation') {
+            this.addMessageToChat('system', frame.response, frame.response_html);
+            this.currentEmergencyType = frame.emergency_type;
+            this.isCasualMode = false;
+            this.updateVisualGuide(frame.emergency_type);
+            this.saveChatHistory();
+        } else if (frame.type === 'error' && this.pendingReplies.has(frame.id)) {
+            const turn = this.pendingReplies.get(frame.id);
+            this.pendingReplies.delete(frame.id);
+            turn.resolve({ status: 'error', response: frame.message });
+        }
+    }
+    
+    sendRealtimeEvent(event) {
+        if (this.realtime && this.realtime.readyState === WebSocket.OPEN) {
+            this.realtime.send(JSON.stringify(event));
+            return true;
+        }
+        return false;
+    }
+    
+    async fetchReply(message) {
+        const response = await fetch('/send_message', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ 
+                message: message,
+                session_id: this.sessionId 
+            })
+        });
+        return response.json();
+    }
+    
+    requestReply(message) {
+        if (!this.realtime || this.realtime.readyState !== WebSocket.OPEN) {
+            return this.fetchReply(message);
+        }
+        
+        const id = this.nextTurnId++;
+        return new Promise((resolve, reject) => {
+            const fallback = () => this.fetchReply(message).then(resolve, reject);
+            this.pendingReplies.set(id, { resolve, fallback });
+            this.sendRealtimeEvent({ type: 'message', id: id, message: message });
+        });
+    }
+    
     initializeVoiceRecognition() {
         const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
         
@@ -455,21 +580,12 @@ class EmergencyResponder {
         }
         
         try {
-            const response = await fetch('/send_message', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ 
-                    message: message,
-                    session_id: this.sessionId 
-                })
-            });
-            
-            const data = await response.json();
+            const data = await this.requestReply(message);
             
             this.removeTypingIndicator();
             
             if (data.status === 'success') {
-                this.addMessageToChat('system', data.response);
+                this.addMessageToChat('system', data.response, data.response_html);
                 
                 if (data.emergency_type && data.emergency_type !== 'casual') {
                     this.currentEmergencyType = data.emergency_type;
@@ -636,7 +752,7 @@ class EmergencyResponder {
     }
     
     // ===== CHAT FUNCTIONS =====
-    addMessageToChat(sender, message) {
+    addMessageToChat(sender, message, html = null) {
         const timestamp = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
         const messageId = Date.now();
         
@@ -644,6 +760,7 @@ class EmergencyResponder {
             id: messageId,
             sender: sender,
             message: message,
+            html: html,
             timestamp: timestamp
         };
         
@@ -670,7 +787,7 @@ class EmergencyResponder {
                 <span class="message-sender">${messageObj.sender === 'system' ? 'Assistant' : 'You'}</span>
                 <span class="message-time">${messageObj.timestamp}</span>
             </div>
-            <div class="message-content">${this.formatMessage(messageObj.message)}</div>
+            <div class="message-content">${messageObj.html || this.formatMessage(messageObj.message)}</div>
         `;
         
         messageContainer.appendChild(messageDiv);
@@ -718,6 +835,18 @@ class EmergencyResponder {
         }, 100);
     }
     
+    showStreamingStep(frame) {
+        // Protocol steps arrive one frame at a time; show them in the typing bubble
+        let typingEl = document.getElementById('typing-indicator');
+        if (!typingEl) {
+            this.showTypingIndicator();
+            typingEl = document.getElementById('typing-indicator');
+            if (!typingEl) return;
+        }
+        const content = typingEl.querySelector('.message-content');
+        content.innerHTML = frame.index === 0 ? frame.html : `${content.innerHTML}<br>${frame.html}`;
+    }
+    
     removeTypingIndicator() {
         const typingEl = document.getElementById('typing-indicator');
         if (typingEl) typingEl.remove();
@@ -832,4 +961,13 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 });
 
+// Offline support: precache the app and answer protocol lookups on-device
+if ('serviceWorker' in navigator) {
+    window.addEventListener('load', () => {
+        navigator.serviceWorker.register('/sw.js')
+            .then(registration => console.log('📴 Offline support ready, scope', registration.scope))
+            .catch(error => console.log('⚠️ Service worker not registered:', error));
+    });
+}
+
 console.log('🚑 Emergency Responder module ready');
\ No newline at end of file
@@ -0,0 +1,166 @@
+// Neonexus offline service worker, served at /sw.js with PRECACHE_VERSION
+// prepended (see precache.py). Precaches the URLs in /precache-manifest.json
+// and answers chat and guide-image requests from the offline catalog when
+// the network is down.
+
+const CACHE_PREFIX = 'neonexus-precache-';
+const CACHE_NAME = CACHE_PREFIX + PRECACHE_VERSION;
+const MANIFEST_URL = '/precache-manifest.json';
+const CATALOG_URL = '/offline/catalog.json';
+// Manifest of the installed version, kept in its cache to reuse unchanged files on update
+const MANIFEST_KEY = '/__precache-manifest__';
+
+let offlineCatalog = null;
+
+async function installedManifest() {
+    for (const name of await caches.keys()) {
+        if (name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME) {
+            const cache = await caches.open(name);
+            const response = await cache.match(MANIFEST_KEY);
+            if (response) {
+                return { cache, files: new Map((await response.json()).files.map(file => [file.url, file.hash])) };
+            }
+        }
+    }
+    return null;
+}
+
+async function precache() {
+    const response = await fetch(MANIFEST_URL, { cache: 'no-store' });
+    const manifest = await response.json();
+    const cache = await caches.open(CACHE_NAME);
+    const previous = await installedManifest();
+    let reused = 0;
+
+    await Promise.all(manifest.files.map(async file => {
+        if (previous && previous.files.get(file.url) === file.hash) {
+            const cached = await previous.cache.match(file.url);
+            if (cached) {
+                reused++;
+                return cache.put(file.url, cached);
+            }
+        }
+        const fresh = await fetch(file.url, { cache: 'reload' });
+        if (!fresh.ok) {
+            throw new Error(`Precache failed for ${file.url}: ${fresh.status}`);
+        }
+        return cache.put(file.url, fresh);
+    }));
+    await cache.put(MANIFEST_KEY, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+    console.log(`📦 Precached ${manifest.file_count} files (${(manifest.total_bytes / 1024).toFixed(0)} KB, ${reused} unchanged)`);
+}
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME) {
+                await caches.delete(name);
+            }
+        }
+        await self.clients.claim();
+    })());
+});
+
+// ===== ON-DEVICE LOOKUPS =====
+async function loadCatalog() {
+    if (!offlineCatalog) {
+        const response = await caches.match(CATALOG_URL);
+        offlineCatalog = response ? await response.json() : null;
+    }
+    return offlineCatalog;
+}
+
+function detectEmergencyType(catalog, message) {
+    // Same rule as the server: first type with a keyword in the message wins
+    const text = message.toLowerCase();
+    for (const [emergencyType, keywords] of catalog.keywords) {
+        if (keywords.some(keyword => text.includes(keyword))) {
+            return emergencyType;
+        }
+    }
+    return null;
+}
+
+function jsonResponse(body) {
+    return new Response(JSON.stringify(body), { headers: { 'Content-Type': 'application/json' } });
+}
+
+async function offlineReply(request) {
+    const catalog = await loadCatalog();
+    const data = await request.json().catch(() => ({}));
+    const message = (data.message || '').trim();
+    if (!catalog || !message) {
+        return jsonResponse({ status: 'error', response: 'You are offline. For real emergencies, call 108/112.' });
+    }
+
+    let emergencyType = detectEmergencyType(catalog, message);
+    let reply;
+    if (emergencyType === 'emergency') {
+        emergencyType = 'universal';
+        reply = catalog.replies.universal;
+    } else if (emergencyType && catalog.protocols[emergencyType]) {
+        reply = catalog.protocols[emergencyType];
+    } else {
+        emergencyType = 'casual';
+        reply = catalog.replies.offline;
+    }
+    return jsonResponse({
+        status: 'success',
+        response: reply.text,
+        response_html: reply.html,
+        emergency_type: emergencyType,
+        session_id: data.session_id || null,
+        offline: true
+    });
+}
+
+async function offlineImages(emergencyType) {
+    const catalog = await loadCatalog();
+    if (!catalog) {
+        return jsonResponse({ status: 'error', message: 'Offline' });
+    }
+    const images = catalog.images[emergencyType] || catalog.images.casual;
+    return jsonResponse({ status: 'success', emergency_type: emergencyType, images: images });
+}
+
+async function networkOr(request, offline) {
+    try {
+        return await fetch(request.clone());
+    } catch (error) {
+        return offline(request);
+    }
+}
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (request.method === 'POST' && url.pathname === '/send_message') {
+        event.respondWith(networkOr(request, offlineReply));
+        return;
+    }
+    if (request.method !== 'GET') {
+        return;
+    }
+    if (url.pathname.startsWith('/get_emergency_images/')) {
+        const emergencyType = decodeURIComponent(url.pathname.slice('/get_emergency_images/'.length));
+        event.respondWith(networkOr(request, () => offlineImages(emergencyType)));
+        return;
+    }
+
+    // Precached files are versioned by the manifest: serve them from the cache
+    event.respondWith((async () => {
+        const cache = await caches.open(CACHE_NAME);
+        const cached = await cache.match(url.pathname, { ignoreSearch: true });
+        return cached || fetch(request);
+    })());
+});
@@ -0,0 +1,182 @@
+"""
+Time Series
+Live per-type event counts in fixed time buckets: per second, rolled up to
+minutes and hours as they are recorded
+
+Each process owns preallocated int64 ring buffers. With a directory (the
+METRICS_DIR used by metrics.py) they live in a memory-mapped file per worker,
+so any worker can sum the live values of every worker on the host without
+messages or locks between processes.
+"""
+
+import json
+import mmap
+import os
+import threading
+import time
+from datetime import datetime
+
+from metrics import _pid_alive
+
+# (name, bucket seconds, buckets kept)
+RESOLUTIONS = (
+    ('second', 1, 300),
+    ('minute', 60, 180),
+    ('hour', 3600, 72),
+)
+
+OTHER = 'other'
+FILE_PREFIX = 'timeseries-'
+FILE_SUFFIX = '.bin'
+HEADER_BYTES = 4096
+MAGIC = b'NXTS1\n'
+# Row marker while a slot is being reset for a new bucket
+RESETTING = -1
+
+
+class RollingCounts:
+    """
+    Ring of count rows per resolution; a row is [bucket number, count per type]
+    inc() is O(1): three slot lookups, resetting a slot when its bucket has passed
+    """
+
+    def __init__(self, types, directory=None, resolutions=RESOLUTIONS):
+        self.types = list(dict.fromkeys(list(types) + [OTHER]))
+        self.columns = {name: index for index, name in enumerate(self.types)}
+        self.resolutions = tuple(resolutions)
+        self.directory = directory
+        self.row_size = 1 + len(self.types)
+        self.offsets = {}
+        rings = []
+        offset = 0
+        for name, width, slots in self.resolutions:
+            self.offsets[name] = offset
+            rings.append((width, slots, offset))
+            offset += slots * self.row_size
+        self._rings = tuple(rings)
+        self.cells = offset
+        self._lock = threading.Lock()
+        self._open()
+
+    def _header(self):
+        header = MAGIC + json.dumps({'types': self.types, 'resolutions': self.resolutions}).encode('utf-8')
+        if len(header) > HEADER_BYTES:
+            raise ValueError("Too many types for the time series header")
+        return header.ljust(HEADER_BYTES, b'\0')
+
+    def _open(self):
+        """Allocate this process's rings (in a shared file when a directory is set)"""
+        size = HEADER_BYTES + self.cells * 8
+        self.path = None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, f"{FILE_PREFIX}{os.getpid()}{FILE_SUFFIX}")
+            with open(self.path, 'wb') as f:
+                f.write(self._header())
+                f.truncate(size)
+            with open(self.path, 'r+b') as f:
+                self._buffer = mmap.mmap(f.fileno(), size)
+        else:
+            self._buffer = bytearray(self._header()) + bytearray(self.cells * 8)
+        self.values = memoryview(self._buffer)[HEADER_BYTES:].cast('q')
+
+    def flush(self):
+        """Write the shared file's pages back to disk (no-op without a directory)"""
+        if self.path:
+            self._buffer.flush()
+
+    def after_fork(self):
+        """A forked worker gets its own rings instead of writing into its parent's"""
+        self._lock = threading.Lock()
+        self._open()
+
+    def inc(self, name, now=None):
+        column = 1 + self.columns.get(name, self.columns[OTHER])
+        second = int(now if now is not None else time.time())
+        values = self.values
+        row_size = self.row_size
+        with self._lock:
+            for width, slots, offset in self._rings:
+                bucket = second // width
+                row = offset + (bucket % slots) * row_size
+                if values[row] != bucket:
+                    values[row] = RESETTING
+                    for cell in range(row + 1, row + row_size):
+                        values[cell] = 0
+                    values[row] = bucket
+                values[row + column] += 1
+
+    def _sources(self):
+        """(types, resolutions, values) for this process and every other live worker"""
+        yield self.types, self.resolutions, self.values
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith(FILE_PREFIX) and filename.endswith(FILE_SUFFIX)):
+                continue
+            try:
+                pid = int(filename[len(FILE_PREFIX):-len(FILE_SUFFIX)])
+            except ValueError:
+                continue
+            if pid == os.getpid() or not _pid_alive(pid):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), 'rb') as f:
+                    data = f.read()
+                header = json.loads(data[len(MAGIC):HEADER_BYTES].rstrip(b'\0'))
+            except (OSError, ValueError):
+                continue
+            if not data.startswith(MAGIC):
+                continue
+            yield header['types'], tuple(map(tuple, header['resolutions'])), memoryview(data)[HEADER_BYTES:].cast('q')
+
+    def windows(self, resolution, count, now=None):
+        """The last count buckets (oldest first, current one included) summed over all workers"""
+        second = int(now if now is not None else time.time())
+        width = dict((name, width) for name, width, slots in self.resolutions)[resolution]
+        current = second // width
+        first = current - count + 1
+        totals = [[0] * len(self.types) for _ in range(count)]
+        workers = 0
+
+        for types, resolutions, values in self._sources():
+            offset = 0
+            for name, source_width, slots in resolutions:
+                if name == resolution:
+                    break
+                offset += slots * (1 + len(types))
+            else:
+                continue
+            workers += 1
+            row_size = 1 + len(types)
+            columns = [self.columns.get(name, self.columns[OTHER]) for name in types]
+            for bucket in range(max(first, current - slots + 1), current + 1):
+                row = offset + (bucket % slots) * row_size
+                if len(values) < row + row_size or values[row] != bucket:
+                    continue
+                target = totals[bucket - first]
+                for index, column in enumerate(columns):
+                    target[column] += values[row + 1 + index]
+
+        return {
+            'resolution': resolution,
+            'bucket_seconds': width,
+            'workers': workers,
+            'windows': [{
+                'start': datetime.fromtimestamp((first + index) * width).isoformat(),
+                'total': sum(counts),
+                'counts': {name: value for name, value in zip(self.types, counts) if value}
+            } for index, counts in enumerate(totals)]
+        }
+
+
+if __name__ == '__main__':
+    # Measure recording overhead
+    import tempfile
+    import timeit
+    counts = RollingCounts(['choking', 'cardiac', 'road_accident'], directory=tempfile.mkdtemp())
+    number = 200000
+    seconds = timeit.timeit(lambda: counts.inc('choking'), number=number)
+    print(f"RollingCounts.inc      {seconds / number * 1e9:8.0f} ns/op")
+    seconds = timeit.timeit(lambda: counts.windows('second', 60), number=1000)
+    print(f"windows('second', 60)  {seconds / 1000 * 1e6:8.1f} us/op")
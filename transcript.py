@@ -0,0 +1,197 @@
+"""
+Transcript Log
+Append-only record of every chat turn and detection event, kept on disk so
+conversations survive restarts and can be analysed later (see analytics.py)
+
+Records are JSON lines in segment files named by start time and process:
+    transcripts/segment-20261019T134500-8123-0001.jsonl
+A background writer group-commits everything queued (write, flush, fsync)
+in one call, and starts a new segment when the current one reaches the
+size or age limit. Request threads only enqueue.
+
+Configuration (environment):
+    TRANSCRIPT_DIR              segment directory (default transcripts/)
+    TRANSCRIPT_SEGMENT_MB       rotate after this many megabytes (default 64)
+    TRANSCRIPT_SEGMENT_MINUTES  rotate after this many minutes (default 60)
+    TRANSCRIPT_FSYNC            fsync each commit, 1 or 0 (default 1)
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+
+from fastjson import encode
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSCRIPT_DIR = os.getenv('TRANSCRIPT_DIR', os.path.join(BASE_DIR, 'transcripts'))
+SEGMENT_BYTES = int(float(os.getenv('TRANSCRIPT_SEGMENT_MB', '64')) * 1024 * 1024)
+SEGMENT_SECONDS = float(os.getenv('TRANSCRIPT_SEGMENT_MINUTES', '60')) * 60
+FSYNC = os.getenv('TRANSCRIPT_FSYNC', '1') != '0'
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+
+QUEUE_SIZE = 50000
+# Records per commit, and how long the writer waits for more before committing
+BATCH_SIZE = 1024
+GROUP_COMMIT_WINDOW = 0.002
+
+# Seconds to wait for queued records at interpreter exit
+EXIT_DRAIN_TIMEOUT = 5.0
+
+
+def list_segments(directory=TRANSCRIPT_DIR):
+    """Segment paths in time order"""
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)]
+
+
+class TranscriptLog:
+    """
+    Durable append-only log with group commit
+    record() never blocks; when the queue is full the record is dropped and counted
+    """
+
+    def __init__(self, directory=TRANSCRIPT_DIR, segment_bytes=SEGMENT_BYTES,
+                 segment_seconds=SEGMENT_SECONDS, fsync=FSYNC, queue_size=QUEUE_SIZE):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segment_seconds = segment_seconds
+        self.fsync = fsync
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.written = 0
+        self.dropped = 0
+        self.commits = 0
+        self.segments = 0
+        self._sequence = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name='transcript-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def record(self, kind, **fields):
+        """Queue a transcript record (kind is 'turn' or 'detection')"""
+        if self._thread is None:
+            self.start()
+        fields['kind'] = kind
+        fields['ts'] = time.time()
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self.dropped += 1
+
+    def _open_segment(self):
+        self._sequence += 1
+        name = (f"{SEGMENT_PREFIX}{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-"
+                f"{self._sequence:04d}{SEGMENT_SUFFIX}")
+        self.segments += 1
+        return open(os.path.join(self.directory, name), 'ab'), time.monotonic()
+
+    def _collect(self):
+        """Block for one record, then gather whatever arrives within the commit window"""
+        try:
+            record = self.queue.get(timeout=1.0)
+        except queue.Empty:
+            return [], False
+        if record is None:
+            return [], True
+        batch = [record]
+        deadline = time.monotonic() + GROUP_COMMIT_WINDOW
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            try:
+                record = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is None:
+                return batch, True
+            batch.append(record)
+        return batch, False
+
+    def _run(self):
+        f = None
+        try:
+            while True:
+                batch, stop = self._collect()
+                if batch:
+                    if f is None:
+                        f, opened = self._open_segment()
+                        size = 0
+                    data = b''.join(encode(record) + b'\n' for record in batch)
+                    f.write(data)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                    size += len(data)
+                    self.written += len(batch)
+                    self.commits += 1
+                    if size >= self.segment_bytes or time.monotonic() - opened >= self.segment_seconds:
+                        f.close()
+                        f = None
+                if stop:
+                    return
+        finally:
+            if f is not None:
+                f.close()
+
+    def after_fork(self):
+        """Drop the parent's writer thread and queue in a forked child; record() restarts it"""
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def close(self, timeout=EXIT_DRAIN_TIMEOUT):
+        """Commit queued records and stop the writer"""
+        thread = self._thread
+        if not thread:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        return {
+            'queued': self.queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'commits': self.commits,
+            'segments': self.segments
+        }
+
+
+transcript_log = TranscriptLog()
+os.register_at_fork(after_in_child=transcript_log.after_fork)
+
+
+if __name__ == '__main__':
+    # Measure enqueue cost and commit batching
+    import tempfile
+    count = 100000
+    log = TranscriptLog(directory=tempfile.mkdtemp(), queue_size=count)
+    log.start()
+    start = time.perf_counter()
+    for i in range(count):
+        log.record('turn', session_id='bench', channel='http', message='someone is choking',
+                   emergency_type='choking', route='protocol')
+    enqueue_seconds = time.perf_counter() - start
+    log.close(timeout=30)
+    total_seconds = time.perf_counter() - start
+    stats = log.stats()
+    print(f"record(): {enqueue_seconds / count * 1e6:.2f} us/op")
+    print(f"{stats['written']} records in {stats['commits']} commits "
+          f"({stats['written'] / max(stats['commits'], 1):.0f} per fsync), "
+          f"{stats['written'] / total_seconds:,.0f} records/s, dropped {stats['dropped']}")